@@ -0,0 +1,64 @@
+"""Compare per record and batch Buddhist era date conversion
+
+    python -m benchmarks.bench_dates
+
+The payload mirrors a crawl of the dividend history of every fund: each
+fund has a few dozen payouts and book closing dates cluster on month and
+quarter ends, so the same strings repeat across funds.
+"""
+
+import random
+import time
+
+from pythainav.utils.date import (
+    _buddhist_to_iso,
+    convert_buddhist_dates,
+    convert_buddhist_to_gregorian,
+)
+
+
+def dividend_dates(funds=2000, payouts=24):
+    days = []
+    for year in range(2548, 2564):
+        for month in range(1, 13):
+            days.append(f"{year}-{month:02d}-{random.choice([15, 25, 28])}")
+    return [random.choice(days) for _ in range(funds * payouts)]
+
+
+def per_record(dates):
+    return [
+        convert_buddhist_to_gregorian(d).date().isoformat()
+        for d in dates
+        if d != "-"
+    ]
+
+
+def timed(func, dates):
+    started = time.perf_counter()
+    result = func(dates)
+    return time.perf_counter() - started, result
+
+
+def main(funds=2000, sample=2000):
+    random.seed(0)
+    dates = dividend_dates(funds)
+    print(f"{len(dates)} dates, {len(set(dates))} distinct")
+
+    # dateparser is too slow to run on the whole crawl, extrapolate
+    seconds, expected = timed(per_record, dates[:sample])
+    per_record_seconds = seconds * len(dates) / sample
+    print(f"  per record  {per_record_seconds:8.3f} s (from {sample} dates)")
+
+    _buddhist_to_iso.cache_clear()
+    cold, result = timed(convert_buddhist_dates, dates)
+    assert result[:sample] == expected
+    warm, _ = timed(convert_buddhist_dates, dates)
+    for name, seconds in [("batch cold", cold), ("batch warm", warm)]:
+        print(
+            f"  {name:<11} {seconds:8.3f} s "
+            f"{per_record_seconds / seconds:8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
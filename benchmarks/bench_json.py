@@ -0,0 +1,97 @@
+"""Compare JSON decoders on payloads shaped like Finnomena and SEC responses
+
+    python -m benchmarks.bench_json
+
+Payloads are generated with the fields of a 20 years `MAX` NAV history from
+Finnomena and of the SEC `FundFactsheet/fund` universe list. Finnomena
+histories are streamed with `iter_json_array`, which always decodes with the
+standard library, so that path is timed as well.
+"""
+
+import datetime
+import json
+import random
+import timeit
+
+from pythainav.utils._optional import import_optional_dependency
+from pythainav.utils.decoder import get_decoder
+from pythainav.utils.stream import iter_json_array
+
+
+def finnomena_max_history(days=5200):
+    start = datetime.datetime(2000, 1, 1)
+    navs = [
+        {
+            "date": (start + datetime.timedelta(days=i)).isoformat() + "Z",
+            "value": round(10 + random.random(), 4),
+            "amount": random.randint(10**8, 10**10),
+        }
+        for i in range(days)
+    ]
+    return {"status": True, "data": {"fund_id": "F00000IT9T", "navs": navs}}
+
+
+def sec_fund_list(funds=2000):
+    return [
+        {
+            "proj_id": f"M{i:04}_2553",
+            "regis_id": f"{i:03}/2553",
+            "regis_date": "2010-11-19",
+            "cancel_date": "-",
+            "proj_name_th": f"กองทุนเปิด ตัวอย่าง {i}",
+            "proj_name_en": f"Example Open Fund {i}",
+            "proj_abbr_name": f"FUND-{i:04}",
+            "fund_status": "RG",
+            "unique_id": f"C{i:010}",
+            "permit_us_investment": "-",
+            "invest_country_flag": "1",
+            "last_upd_date": "2020-01-01T01:02:03",
+        }
+        for i in range(funds)
+    ]
+
+
+def _chunks(body, size=65536):
+    return (body[i : i + size] for i in range(0, len(body), size))
+
+
+def main(number=20):
+    random.seed(0)
+    decoders = {"json": json.loads, "default": get_decoder()}
+    for name in ["orjson", "ujson", "simplejson"]:
+        module = import_optional_dependency(name, raise_on_missing=False)
+        if module is not None:
+            decoders[name] = module.loads
+
+    payloads = {
+        "finnomena MAX history": json.dumps(finnomena_max_history()).encode(),
+        "sec fund list": json.dumps(
+            sec_fund_list(), ensure_ascii=False
+        ).encode(),
+    }
+    for payload_name, body in payloads.items():
+        print(f"{payload_name} ({len(body) / 1024:.0f} KiB)")
+        baseline = None
+        for name, loads in decoders.items():
+            seconds = timeit.timeit(lambda: loads(body), number=number) / number
+            baseline = baseline or seconds
+            print(
+                f"  {name:<10} {seconds * 1000:8.2f} ms "
+                f"{baseline / seconds:6.1f}x"
+            )
+
+    # what `Finnomena.get_range` and `get_history` actually run
+    body = payloads["finnomena MAX history"]
+    seconds = (
+        timeit.timeit(
+            lambda: list(iter_json_array(_chunks(body), "navs")),
+            number=number,
+        )
+        / number
+    )
+    print("finnomena MAX history, streamed in 64 KiB chunks")
+    print(f"  {'stream':<10} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
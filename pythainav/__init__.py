@@ -10,4 +10,4 @@ except PackageNotFoundError:  # pragma: no cover
     __version__ = "unknown"
 
 from .api import get  # lgtm [py/import-own-module]
-from .api import get_all
+from .api import get_all, snapshot, warm
@@ -1,4 +1,10 @@
-from typing import List
+from typing import Dict, Iterable, List, Union
+
+import calendar
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     from typing import Literal
@@ -6,9 +12,75 @@ except ImportError:
     from typing_extensions import Literal
 
 from . import sources
-from .nav import Nav
+from .cache import WarmReport, get_default_cache
+from .nav import Nav, Snapshot
 from .utils._optional import import_optional_dependency
 
+# latency stats of a `Hedged` source only help if it outlives the call, one
+# instance is shared per set of arguments
+_hedged: Dict[tuple, sources.Hedged] = {}
+_hedged_lock = threading.Lock()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _shared_hedged(subscription_key=None, **kargs) -> sources.Hedged:
+    key = (_freeze(subscription_key), _freeze(kargs))
+    with _hedged_lock:
+        source = _hedged.get(key)
+        if source is None or source.closed:
+            source = sources.Hedged.default(subscription_key, **kargs)
+            _hedged[key] = source
+        return source
+
+
+source2class = {
+    "finnomena": sources.Finnomena,
+    "sec": sources.Sec,
+    "hedged": _shared_hedged,
+    # "onde": sources.Onde,
+}
+
+
+def _create_source(source, **kargs) -> sources.Source:
+    # a source object can be given to reuse its session and cache
+    if isinstance(source, sources.Source):
+        return source
+    return source2class[source](**kargs)
+
+
+def _source_name(source) -> str:
+    return source if isinstance(source, str) else type(source).__name__.lower()
+
+
+def _sec_period(range: str, today: datetime.date = None) -> str:
+    """First date of a Finnomena `range`, as the `period` of `Sec`"""
+    if range == "MAX":
+        return "SI"
+    today = today or datetime.date.today()
+    if range == "YTD":
+        return today.replace(month=1, day=1).isoformat()
+    count, unit = int(range[:-1]), range[-1]
+    if unit in ("D", "W"):
+        days = count * (7 if unit == "W" else 1)
+        return (today - datetime.timedelta(days=days)).isoformat()
+    months = count * (12 if unit == "Y" else 1)
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    day = min(today.day, calendar.monthrange(year, month + 1)[1])
+    return datetime.date(year, month + 1, day).isoformat()
+
+
+def _get_history(source: sources.Source, fund: str, range: str = "MAX"):
+    if isinstance(source, sources.Sec):
+        return source.get_range(fund, period=_sec_period(range))
+    return source.get_range(fund.lower(), range=range)
+
 
 def get(fund_name, *, source="finnomena", date=None, **kargs) -> Nav:
     """
@@ -35,12 +107,7 @@ def get(fund_name, *, source="finnomena", date=None, **kargs) -> Nav:
     """
     fund_name = fund_name
 
-    source2class = {
-        "finnomena": sources.Finnomena,
-        "sec": sources.Sec,
-        # "onde": sources.Onde,
-    }
-    _source = source2class[source](**kargs)
+    _source = _create_source(source, **kargs)
 
     nav = _source.get(fund_name, date)
 
@@ -97,15 +164,9 @@ def get_all(
     [2265 rows x 4 columns]
     ```
     """
-    fund_name = fund_name.lower()
+    _source = _create_source(source, **kargs)
 
-    source2class = {
-        "finnomena": sources.Finnomena,
-        "sec": sources.Sec,
-    }
-    _source = source2class[source](**kargs)
-
-    navs = _source.get_range(fund_name, range=range)
+    navs = _get_history(_source, fund_name, range)
 
     if asDataFrame:
         pd = import_optional_dependency("pandas")
@@ -114,3 +175,132 @@ def get_all(
         navs = pd.DataFrame([asdict(x) for x in navs])
 
     return navs
+
+
+def snapshot(
+    funds: List[str] = None,
+    *,
+    source="finnomena",
+    max_workers: int = 32,
+    **kargs,
+) -> Snapshot:
+    """
+    Gets the latest NAV of many funds, the whole universe by default
+
+    The fund list is resolved once and the latest NAVs are fetched
+    concurrently over a pooled connection.
+
+    **Parameters:**
+
+    * **funds** - *(optional)* fund names, default to every fund the source
+    lists
+    * **source** - *(optional)* Data source for pull data. See Data Sources
+    section in the documentation for all availiable options.
+    * **max_workers** - *(optional)* number of concurrent requests
+    * **subscription_key** - *(optional)* Subscription key that required for
+    a data source like `sec` (a.k.a)
+
+    **Returns:** `Snapshot` with `fund`, `value` and `updated` columns, the
+    funds that failed in `errors` and the time taken in `elapsed`
+
+    Usage:
+    ```
+    >>> import pythainav as nav
+
+    >>> snap = nav.snapshot()
+    >>> len(snap), snap.elapsed, len(snap.errors)
+    (1987, 21.4, 13)
+    >>> snap.to_dataframe()
+    ```
+    """
+    _source = _create_source(source, **kargs)
+
+    return _source.snapshot(funds, max_workers=max_workers)
+
+
+def warm(
+    funds: List[str] = (),
+    *,
+    ranges: Iterable[str] = ("1Y",),
+    sources: Iterable[Union[str, sources.Source]] = ("finnomena",),
+    max_workers: int = 16,
+    **kargs,
+) -> WarmReport:
+    """
+    Pre-load the fund list and histories into the caches of sources
+
+    Meant to run before serving traffic. Sources given by name are created
+    with `**kargs` and cache into the backend set by `set_default_cache`, a
+    `ValueError` is raised when none is set since their caches would be
+    thrown away. Pass source objects to warm their own caches instead. Fund
+    lists are loaded before the histories that look funds up in them.
+
+    **Parameters:**
+
+    * **funds** - *(optional)* funds whose histories are loaded
+    * **ranges** - *(optional)* history ranges to load for each fund
+    * **sources** - *(optional)* source names or objects
+    * **max_workers** - *(optional)* number of concurrent requests
+    * **subscription_key** - *(optional)* Subscription key that required for
+    a data source like `sec` (a.k.a)
+
+    **Returns:** `WarmReport` with what was `loaded`, the `errors`, the time
+    taken in `elapsed` and the `entries` and `bytes` held by the caches
+
+    Usage:
+    ```
+    >>> import pythainav as nav
+    >>> from pythainav.cache import SQLiteCache, set_default_cache
+
+    >>> set_default_cache(SQLiteCache("/tmp/pythainav-cache.db"))
+    >>> report = nav.warm(top_funds, ranges=["1Y", "MAX"])
+    >>> report.ready, report.elapsed, report.bytes
+    (True, 12.8, 48213337)
+    ```
+    """
+    started = time.perf_counter()
+    sources = list(sources)
+    if get_default_cache() is None and any(isinstance(s, str) for s in sources):
+        raise ValueError(
+            "sources given by name need a shared cache, call "
+            "set_default_cache first or pass source objects"
+        )
+    report = WarmReport()
+    report.sources = [_create_source(source, **kargs) for source in sources]
+
+    list_jobs, history_jobs = {}, {}
+    for name, source in zip(map(_source_name, sources), report.sources):
+        list_jobs[f"{name}:list"] = (source.list,)
+        for fund in funds:
+            for range in ranges:
+                history_jobs[f"{name}:{fund}:{range}"] = (
+                    _get_history,
+                    source,
+                    fund,
+                    range,
+                )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for jobs in [list_jobs, history_jobs]:
+            futures = {executor.submit(*job): key for key, job in jobs.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    report.errors[key] = repr(e)
+                    continue
+                if result:
+                    report.loaded.append(key)
+                else:
+                    report.errors[key] = "no data"
+    report.loaded.sort()
+
+    # sources may share one backend, count it once
+    caches = {id(s.cache): s.cache for s in report.sources}
+    for cache in caches.values():
+        stats = cache.stats()
+        report.entries += stats.get("entries", 0)
+        report.bytes += stats.get("bytes", 0)
+    report.elapsed = time.perf_counter() - started
+    return report
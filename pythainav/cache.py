@@ -0,0 +1,486 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import functools
+import inspect
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from .utils.sqlite import ThreadLocalConnection
+
+ONE_HOUR = 60 * 60
+ONE_DAY = 24 * ONE_HOUR
+
+MISSING = object()
+
+
+def _sizeof(value) -> int:
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class CacheBackend(ABC):
+    """Interface of a cache shared by the cached methods of sources
+
+    Implement `get`, `set`, `delete` and `clear` to plug in an external store
+    such as Redis or memcached. Keys are strings, values are any picklable
+    object.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str, default=None):
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class MemoryCache(CacheBackend):
+    """Thread safe LRU cache in process memory
+
+    **Parameters:**
+
+    * **max_entries** - *(optional)* maximum number of entries
+    * **max_bytes** - *(optional)* maximum total size of the entries, sizes are
+    estimated from their pickled size
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = 1024, max_bytes: Optional[int] = None
+    ):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # key -> (value, expires_at, size)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] > time.time()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        size = _sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while (
+                self.max_entries is not None
+                and len(self._data) > self.max_entries
+            ) or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.bytes -= item[2]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file, shared by every process on a host
+
+    SQLite serialises writers across processes and WAL mode lets readers run
+    alongside them, so many workers can point at the same file and share one
+    warm cache.
+
+    **Parameters:**
+
+    * **path** - path of the database file
+    * **max_entries** - *(optional)* oldest entries are evicted beyond this
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None):
+        super().__init__()
+        self._conn = ThreadLocalConnection(path)
+        self.path = self._conn.path
+        self.max_entries = max_entries
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB, "
+                "expires_at REAL, stored_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_stored_at "
+                "ON cache (stored_at)"
+            )
+
+    def get(self, key: str, default=None):
+        row = (
+            self._conn()
+            .execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            )
+            .fetchone()
+        )
+        if row is not None and (row[1] is None or row[1] > time.time()):
+            self.hits += 1
+            return pickle.loads(row[0])
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, now),
+            )
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                    "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def prune(self):
+        """Delete expired entries"""
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE expires_at < ?", (time.time(),)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = (
+            self._conn()
+            .execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache"
+            )
+            .fetchone()
+        )
+        return {**super().stats(), "entries": entries, "bytes": size}
+
+
+# limits of the private cache each source gets when no backend is shared
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# bodies kept by a `Revalidator` for conditional requests
+REVALIDATE_MAX_ENTRIES = 64
+REVALIDATE_MAX_BYTES = 16 * 1024 * 1024
+
+_default_cache = None
+
+
+def get_default_cache() -> Optional[CacheBackend]:
+    return _default_cache
+
+
+def new_instance_cache() -> CacheBackend:
+    """The shared default backend if one is set, else a new bounded cache"""
+    if _default_cache is not None:
+        return _default_cache
+    return MemoryCache(
+        max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES
+    )
+
+
+def set_default_cache(cache: Optional[CacheBackend]):
+    """Share one backend by every source created without `cache=`
+
+    By default each source has its own `MemoryCache` bounded by
+    `DEFAULT_MAX_ENTRIES` and `DEFAULT_MAX_BYTES` that is freed with it.
+    Pass `None` to go back to that.
+
+    Usage:
+    ```
+    >>> from pythainav.cache import SQLiteCache, set_default_cache
+
+    >>> set_default_cache(SQLiteCache("/tmp/pythainav-cache.db"))
+    ```
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+class Revalidator:
+    """Conditional HTTP requests backed by their own bounded store
+
+    Bodies are stored with their `ETag` and `Last-Modified` validators for
+    `ttl` seconds, apart from the cached results so they never evict them.
+    Later requests send them back as `If-None-Match` and `If-Modified-Since`
+    and a 304 answer is served from the stored body, counting the bytes it
+    saved. A 304 whose body was evicted meanwhile is asked again without
+    validators.
+
+    **Parameters:**
+
+    * **cache** - *(optional)* backend of the bodies, e.g. a `SQLiteCache`
+    shared by processes, default to a `MemoryCache` of
+    `REVALIDATE_MAX_ENTRIES` and `REVALIDATE_MAX_BYTES`
+    * **ttl** - *(optional)* seconds a body is kept
+
+    Usage:
+    ```
+    >>> response, content = revalidator.request(
+    ...     url, lambda headers: session.get(url, headers=headers)
+    ... )
+    >>> revalidator.stats()
+    {'requests': 24, 'not_modified': 23, 'bytes_saved': 9421312}
+    ```
+    """
+
+    def __init__(self, cache: CacheBackend = None, ttl: float = 7 * ONE_DAY):
+        if cache is None:
+            cache = MemoryCache(
+                max_entries=REVALIDATE_MAX_ENTRIES,
+                max_bytes=REVALIDATE_MAX_BYTES,
+            )
+        self.cache = cache
+        self.ttl = ttl
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return f"http.GET({url!r})"
+
+    def headers(self, url: str) -> Dict[str, str]:
+        """Validators to send with a request of `url`"""
+        entry = self.cache.get(self._key(url))
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def request(self, url: str, send) -> Tuple[Any, bytes]:
+        """Send a conditional request of `url` with `send(headers)`
+
+        **Returns:** the response and its body, the stored one on a 304
+        """
+        response = send(self.headers(url))
+        content = self.content(url, response)
+        if content is None:
+            response = send({})
+            content = self.content(url, response)
+        return response, content
+
+    def content(self, url: str, response) -> Optional[bytes]:
+        """Body of `response`, the stored one when it is a 304
+
+        `None` when it is a 304 and nothing is stored anymore.
+        """
+        key = self._key(url)
+        if response.status_code == 304:
+            entry = self.cache.get(key)
+            with self._lock:
+                self.requests += 1
+                if entry is not None:
+                    self.not_modified += 1
+                    self.bytes_saved += len(entry["content"])
+            return entry["content"] if entry is not None else None
+        with self._lock:
+            self.requests += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self.cache.set(
+                key,
+                {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "content": response.content,
+                },
+                ttl=self.ttl,
+            )
+        return response.content
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def make_key(namespace: str, name: str, args, kwargs) -> str:
+    parts = [repr(a) for a in args]
+    parts += [f"{k}={v!r}" for k, v in sorted(kwargs.items())]
+    return f"{namespace}.{name}({', '.join(parts)})"
+
+
+def _normalize_args(signature: inspect.Signature, args, kwargs):
+    """Arguments of a call as bound by `signature`, defaults applied
+
+    `f(x)`, `f(x, "1Y")` and `f(x, range="1Y")` give the same arguments, so
+    they share one cache entry.
+    """
+    bound = signature.bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    args, kwargs = [], {}
+    for name, param in list(signature.parameters.items())[1:]:
+        value = bound.arguments[name]
+        if param.kind == param.VAR_POSITIONAL:
+            args.extend(value)
+        elif param.kind == param.VAR_KEYWORD:
+            kwargs.update(value)
+        elif param.kind == param.KEYWORD_ONLY:
+            kwargs[name] = value
+        else:
+            args.append(value)
+    return tuple(args), kwargs
+
+
+class _Flight:
+    """Call of a cached method in progress, shared by concurrent misses"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callers = 0
+        self.value = MISSING
+
+
+_flights: Dict[tuple, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def cached(ttl: Optional[float] = None):
+    """Cache a source method in the source's `cache` backend
+
+    Keys are built from the class name, method name and arguments, not from
+    `self`, so equal sources share entries. Arguments are bound to the
+    method signature first, so positional, keyword and default values of
+    the same call share one key. Concurrent misses on a key make a single
+    call and share its result. `None` results are not cached.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def key(self, *args, **kwargs) -> str:
+            args, kwargs = _normalize_args(signature, args, kwargs)
+            return make_key(type(self).__name__, func.__name__, args, kwargs)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "cache", None)
+            if cache is None:
+                return func(self, *args, **kwargs)
+            cache_key = key(self, *args, **kwargs)
+            value = cache.get(cache_key, MISSING)
+            if value is not MISSING:
+                return value
+
+            name = (id(cache), cache_key)
+            with _flights_lock:
+                flight = _flights.setdefault(name, _Flight())
+                flight.callers += 1
+            try:
+                with flight.lock:
+                    if flight.value is not MISSING:
+                        return flight.value
+                    value = cache.get(cache_key, MISSING)
+                    if value is MISSING:
+                        value = func(self, *args, **kwargs)
+                        if value is not None:
+                            cache.set(cache_key, value, ttl=ttl)
+                    flight.value = value
+                    return value
+            finally:
+                with _flights_lock:
+                    flight.callers -= 1
+                    if not flight.callers:
+                        del _flights[name]
+
+        wrapper.uncached = func
+        wrapper.ttl = ttl
+        wrapper.key = key
+        return wrapper
+
+    return decorator
+
+
+def recache(source, name: str, *args, **kwargs):
+    """Call a cached method bypassing the cache and store the fresh result"""
+    method = getattr(type(source), name)
+    value = method.uncached(source, *args, **kwargs)
+    cache = getattr(source, "cache", None)
+    if value is not None and cache is not None:
+        cache.set(method.key(source, *args, **kwargs), value, ttl=method.ttl)
+    return value
+
+
+@dataclass
+class WarmReport:
+    """What `warm` loaded into the caches of its sources"""
+
+    loaded: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+    entries: int = 0
+    bytes: int = 0
+    sources: List[Any] = field(default_factory=list)
+
+    @property
+    def ready(self) -> bool:
+        """True when everything requested was loaded"""
+        return bool(self.loaded) and not self.errors
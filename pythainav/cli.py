@@ -0,0 +1,392 @@
+from typing import Dict, List
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import __version__
+from .api import _create_source, _get_history
+from .sources import Sec
+from .store import Store, _to_date
+from .utils._optional import import_optional_dependency
+
+
+def _subscription_key(args) -> Dict[str, str]:
+    key = {
+        "fundfactsheet": args.fundfactsheet_key
+        or os.environ.get("FUND_FACTSHEET_KEY"),
+        "funddailyinfo": args.funddailyinfo_key
+        or os.environ.get("FUND_DAILY_INFO_KEY"),
+    }
+    return key if all(key.values()) else None
+
+
+def _source_from_args(args):
+    if args.source == "finnomena":
+        return _create_source("finnomena")
+    return _create_source(args.source, subscription_key=_subscription_key(args))
+
+
+def _universe(source) -> List[str]:
+    funds = source.list() or []
+    if isinstance(funds, dict):
+        return sorted(funds)
+    return sorted(f["proj_abbr_name"] for f in funds)
+
+
+class State:
+    """Progress of a download saved after every fund so a run can resume"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.done = set()
+        self.failed = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.done = set(data.get("done", []))
+
+    def mark(self, fund: str, error: str = None):
+        with self._lock:
+            if error is None:
+                self.done.add(fund)
+                self.failed.pop(fund, None)
+            else:
+                self.failed[fund] = error
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"done": sorted(self.done), "failed": self.failed},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self.path)
+
+
+class CsvWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, fund: str, navs):
+        with self._lock:
+            new = not os.path.exists(self.path) or not os.path.getsize(
+                self.path
+            )
+            with open(self.path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(["fund", "date", "value", "amount"])
+                writer.writerows(
+                    [
+                        fund,
+                        _to_date(nav.updated),
+                        nav.value,
+                        getattr(nav, "amount", None),
+                    ]
+                    for nav in navs
+                )
+
+
+class ParquetWriter:
+    """One parquet file per fund in a directory"""
+
+    def __init__(self, path: str):
+        self.pd = import_optional_dependency("pandas")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, fund: str, navs):
+        df = self.pd.DataFrame(
+            {
+                "fund": fund,
+                "date": self.pd.to_datetime([nav.updated for nav in navs]),
+                "value": [nav.value for nav in navs],
+                "amount": [getattr(nav, "amount", None) for nav in navs],
+            }
+        )
+        df.to_parquet(os.path.join(self.path, f"{fund}.parquet"), index=False)
+
+
+class StoreWriter:
+    def __init__(self, path: str, source: str = ""):
+        self.store = Store(path)
+        self.source = source
+
+    def write(self, fund: str, navs):
+        self.store.write_navs(fund, navs, source=self.source)
+
+
+def _writer_from_args(args):
+    if args.format == "csv":
+        return CsvWriter(args.output)
+    if args.format == "parquet":
+        return ParquetWriter(args.output)
+    return StoreWriter(args.output, source=args.source)
+
+
+def download(args):
+    source = _source_from_args(args)
+    writer = _writer_from_args(args)
+    if args.state is None:
+        # one checkpoint per output, a run to another output starts afresh
+        args.state = f"{os.path.normpath(args.output)}.state.json"
+    state = State(args.state)
+
+    funds = args.funds or _universe(source)
+    todo = [f for f in funds if f not in state.done]
+    skipped = len(funds) - len(todo)
+    if skipped:
+        print(f"resuming, {skipped} funds already done", file=sys.stderr)
+
+    if args.factsheets:
+        from .fund import Fund
+
+        os.makedirs(args.factsheets, exist_ok=True)
+
+    def work(fund):
+        navs = _get_history(source, fund, args.range) or []
+        profile = None
+        if args.factsheets and isinstance(source, Sec):
+            profile = Fund.from_name(fund, source=source).prefetch()
+        # written once every step succeeded, a failed fund leaves no rows
+        # behind to be appended again on resume
+        writer.write(fund, navs)
+        if profile is not None:
+            path = os.path.join(args.factsheets, f"{fund}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, default=str)
+        return len(navs)
+
+    started = time.perf_counter()
+    rows = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(work, fund): fund for fund in todo}
+        for n, future in enumerate(as_completed(futures), start=1):
+            fund = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                state.mark(fund, repr(e))
+                print(
+                    f"[{n}/{len(todo)}] {fund} failed: {e!r}", file=sys.stderr
+                )
+                continue
+            state.mark(fund)
+            rows += count
+            elapsed = time.perf_counter() - started
+            print(
+                f"[{n}/{len(todo)}] {fund} {count} rows "
+                f"({n / elapsed:.1f} funds/s, {rows / elapsed:.0f} rows/s)",
+                file=sys.stderr,
+            )
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"done {len(todo) - len(state.failed)} funds, {rows} rows in "
+        f"{elapsed:.1f}s, {len(state.failed)} failed",
+        file=sys.stderr,
+    )
+    return 1 if state.failed else 0
+
+
+def refresh(args):
+    import logging
+
+    from .scheduler import RefreshScheduler
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    scheduler = RefreshScheduler(
+        _source_from_args(args),
+        args.funds or None,
+        store=Store(args.store) if args.store else None,
+        source_name=args.source,
+        max_workers=args.workers,
+    )
+    if args.once:
+        changed = scheduler.run_once()
+        print(f"{len(changed)} funds changed", file=sys.stderr)
+        return 0
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def crawl(args):
+    from .crawler import FactsheetCrawler
+
+    subscription_key = _subscription_key(args)
+    if subscription_key is None:
+        print("crawl needs Sec subscription keys", file=sys.stderr)
+        return 2
+    crawler = FactsheetCrawler(
+        Sec(subscription_key=subscription_key),
+        Store(args.output),
+        sections=args.sections,
+        max_age=args.max_age * 60 * 60,
+        max_workers=args.workers,
+    )
+    report = crawler.run(funds=args.funds or None, amcs=args.amc)
+    for key, error in sorted(report.errors.items()):
+        print(f"{key} failed: {error}", file=sys.stderr)
+    print(
+        f"done {report.funds} funds, {report.fetched} sections fetched, "
+        f"{report.skipped} fresh, {len(report.errors)} failed in "
+        f"{report.elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    return 1 if report.errors else 0
+
+
+def serve(args):
+    import asyncio
+    import logging
+
+    from .server import NavService
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    service = NavService(
+        _source_from_args(args),
+        store=Store(args.store) if args.store else None,
+        max_workers=args.workers,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+def _add_source_arguments(parser):
+    parser.add_argument(
+        "--source",
+        default="finnomena",
+        choices=["finnomena", "sec", "hedged"],
+        help="data source (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fundfactsheet-key",
+        help="Sec FundFactsheet key, default to $FUND_FACTSHEET_KEY",
+    )
+    parser.add_argument(
+        "--funddailyinfo-key",
+        help="Sec FundDailyInfo key, default to $FUND_DAILY_INFO_KEY",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pythainav", description="Pull Thai mutual fund NAV"
+    )
+    parser.add_argument(
+        "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    p = commands.add_parser(
+        "download",
+        help="download NAV histories in bulk",
+        description="Download NAV histories of many funds in parallel. "
+        "Progress is saved to --state so an interrupted run resumes.",
+    )
+    p.add_argument("funds", nargs="*", help="fund names, default to all funds")
+    _add_source_arguments(p)
+    p.add_argument("--range", default="MAX", help="history range (Finnomena)")
+    p.add_argument("-j", "--workers", type=int, default=8)
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument(
+        "-f",
+        "--format",
+        default="csv",
+        choices=["csv", "parquet", "store"],
+        help="csv file, parquet directory or SQLite store",
+    )
+    p.add_argument(
+        "--state",
+        help="checkpoint file (default: OUTPUT.state.json), empty to disable",
+    )
+    p.add_argument(
+        "--factsheets",
+        metavar="DIR",
+        help="also save Sec factsheets as one JSON per fund in DIR",
+    )
+    p.set_defaults(func=download)
+
+    p = commands.add_parser(
+        "refresh",
+        help="refresh latest NAVs at publication time",
+        description="Poll latest NAVs around the evening publication time "
+        "and write the ones that changed to a store.",
+    )
+    p.add_argument("funds", nargs="*", help="watchlist, default to all funds")
+    _add_source_arguments(p)
+    p.add_argument("--store", help="SQLite store to write new NAVs to")
+    p.add_argument("-j", "--workers", type=int, default=16)
+    p.add_argument("--once", action="store_true", help="poll once and exit")
+    p.set_defaults(func=refresh)
+
+    p = commands.add_parser(
+        "crawl",
+        help="crawl Sec factsheets of all AMCs into a store",
+        description="Fetch factsheet sections of every fund concurrently "
+        "into a SQLite store, skipping sections that are still fresh.",
+    )
+    p.add_argument("funds", nargs="*", help="proj_id, default to all funds")
+    _add_source_arguments(p)
+    p.add_argument("--amc", action="append", help="only funds of this AMC")
+    p.add_argument(
+        "--sections", nargs="+", help="sections to fetch, default to all"
+    )
+    p.add_argument(
+        "--max-age",
+        type=float,
+        default=7 * 24,
+        help="hours a section stays fresh (default: %(default)s)",
+    )
+    p.add_argument("-j", "--workers", type=int, default=8)
+    p.add_argument("-o", "--output", required=True, help="SQLite store")
+    p.set_defaults(func=crawl)
+
+    p = commands.add_parser(
+        "serve",
+        help="serve NAV queries over HTTP",
+        description="Run an HTTP service answering latest, history, asof "
+        "and batch NAV queries from one warm cache.",
+    )
+    _add_source_arguments(p)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--store", help="SQLite store used by asof queries")
+    p.add_argument("-j", "--workers", type=int, default=16)
+    p.set_defaults(func=serve)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+from typing import Dict, Iterable, List
+
+import time
+from dataclasses import dataclass, field
+
+from .cache import ONE_DAY
+from .fund import SECTIONS
+from .sources import Sec
+from .store import Store
+from .utils.concurrent import imap
+
+# sections served by the FundDailyInfo product, the rest are FundFactsheet
+DAILY_INFO_SECTIONS = {"dividend"}
+
+
+@dataclass
+class CrawlReport:
+    """Outcome of a `FactsheetCrawler.run`"""
+
+    funds: int = 0
+    fetched: int = 0
+    skipped: int = 0
+    errors: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+class FactsheetCrawler:
+    """Crawl factsheet sections of every fund of every AMC into a `Store`
+
+    AMCs are listed first, then their funds, then the selected sections of
+    each fund are fetched concurrently and saved as each one arrives, so an
+    interrupted crawl keeps what it got. Sections fetched less than
+    `max_age` seconds ago are skipped. Requests are rate limited by the key
+    pools of `source`, whose budget is checked before the crawl starts.
+
+    **Parameters:**
+
+    * **source** - `Sec` source
+    * **store** - `Store` the sections are saved to
+    * **sections** - *(optional)* names of `pythainav.fund.SECTIONS`,
+    default to all
+    * **max_age** - *(optional)* seconds a fetched section stays fresh
+    * **max_workers** - *(optional)* number of concurrent requests
+
+    Usage:
+    ```
+    >>> from pythainav.crawler import FactsheetCrawler
+    >>> from pythainav.store import Store
+
+    >>> crawler = FactsheetCrawler(sec, Store("pythainav.db"), ["fee", "risk"])
+    >>> crawler.run()
+    CrawlReport(funds=2712, fetched=5424, skipped=0, errors={}, ...)
+    >>> crawler.store.read_section("M0123_2553", "fee")
+    [{'fee_type_desc': ..., ...}]
+    ```
+    """
+
+    def __init__(
+        self,
+        source: Sec,
+        store: Store,
+        sections: Iterable[str] = None,
+        max_age: float = 7 * ONE_DAY,
+        max_workers: int = 8,
+    ):
+        sections = list(SECTIONS if sections is None else sections)
+        unknown = [s for s in sections if s not in SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown sections {unknown}")
+        self.source = source
+        self.store = store
+        self.sections = sections
+        self.max_age = max_age
+        self.max_workers = max_workers
+
+    def list_funds(self, amcs: Iterable[str] = None) -> List[str]:
+        """`proj_id` of the funds of the given AMCs, default to all AMCs"""
+        if amcs is None:
+            amcs = [amc["unique_id"] for amc in self.source.list_amc() or []]
+        funds = []
+        for result in imap(
+            self.source.list_fund_under_amc,
+            amcs,
+            max_workers=self.max_workers,
+        ):
+            funds.extend(fund["proj_id"] for fund in result or [])
+        return list(dict.fromkeys(funds))
+
+    def run(
+        self, funds: Iterable[str] = None, amcs: Iterable[str] = None
+    ) -> CrawlReport:
+        """Fetch the sections that are not fresh of `funds` or of all funds"""
+        started = time.perf_counter()
+        report = CrawlReport()
+        funds = list(funds) if funds is not None else self.list_funds(amcs)
+        report.funds = len(funds)
+
+        fresh = self.store.fresh_sections(self.max_age)
+        todo = [
+            (fund, section)
+            for fund in funds
+            for section in self.sections
+            if (fund, section) not in fresh
+        ]
+        report.skipped = len(funds) * len(self.sections) - len(todo)
+
+        daily = sum(1 for _, s in todo if s in DAILY_INFO_SECTIONS)
+        for product, needed in [
+            ("fundfactsheet", len(todo) - daily),
+            ("funddailyinfo", daily),
+        ]:
+            if needed:
+                self.source.key_pools[product].reserve(needed)
+
+        def fetch(job):
+            fund, section = job
+            try:
+                data = getattr(self.source, SECTIONS[section])(fund)
+            except Exception as e:
+                return job, e
+            # saved from the worker thread, the store is thread safe
+            self.store.write_section(fund, section, data)
+            return job, None
+
+        for (fund, section), error in imap(
+            fetch, todo, max_workers=self.max_workers, ordered=False
+        ):
+            if error is None:
+                report.fetched += 1
+            else:
+                report.errors[f"{fund}/{section}"] = repr(error)
+        report.elapsed = time.perf_counter() - started
+        return report
@@ -1,4 +1,118 @@
+from typing import Dict, Iterable
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .sources import Sec
+
+# attribute name -> `Sec` getter taking only the fund id
+SECTIONS = {
+    "factsheet_url": "get_fund_factsheet_url",
+    "ipo": "get_fund_ipo",
+    "investment": "get_fund_investment",
+    "project_type": "get_fund_project_type",
+    "policy": "get_fund_policy",
+    "specification": "get_fund_specification",
+    "feeder_fund": "get_fund_feeder_fund",
+    "redemption": "get_fund_redemption",
+    "suitability": "get_fund_suitability",
+    "risk": "get_fund_risk",
+    "asset": "get_fund_asset",
+    "turnover_ratio": "get_fund_turnover_ratio",
+    "returns": "get_fund_return",
+    "buy_and_hold": "get_fund_buy_and_hold",
+    "benchmark": "get_fund_benchmark",
+    "compare": "get_fund_compare",
+    "class_fund": "get_class_fund",
+    "performance": "get_fund_performance",
+    "five_year_lost": "get_fund_5yearlost",
+    "dividend_policy": "get_fund_dividend_policy",
+    "fee": "get_fund_fee",
+    "involveparty": "get_fund_involveparty",
+    "dividend": "get_fund_dividend",
+}
+
+
 class Fund:
-    """a fund object"""
+    """a fund object
+
+    Factsheet sections from `Sec` are fetched on first access of the
+    attribute of the same name (see `SECTIONS`) and cached on the object.
+
+    Usage:
+    ```
+    >>> from pythainav.fund import Fund
+
+    >>> fund = Fund.from_name("KT-PRECIOUS", subscription_key=subs_key)
+    >>> fund.prefetch(["policy", "fee", "risk"])  # one parallel round-trip
+    >>> fund.fee
+    [{'fee_type_desc': ..., ...}]
+    >>> fund.asset  # fetched lazily
+    ```
+    """
+
+    def __init__(self, fund_id: str, *, source: Sec = None, **kargs):
+        if not fund_id:
+            raise ValueError("Must specify fund")
+        self.fund_id = fund_id
+        self.source = source if source is not None else Sec(**kargs)
+        self._sections = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_name(cls, name: str, *, source: Sec = None, **kargs):
+        source = source if source is not None else Sec(**kargs)
+        list_fund = source.search(name)
+        if not list_fund:
+            raise ValueError(f"Fund {name} not found")
+        fund = cls(list_fund[0]["proj_id"], source=source)
+        fund.info = list_fund[0]
+        return fund
+
+    def __getattr__(self, name):
+        # only called when normal lookup fails, i.e. for sections
+        if name in SECTIONS:
+            return self.load(name)
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}"
+        )
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(SECTIONS)
+
+    def __repr__(self):
+        return f"Fund(fund_id={self.fund_id!r})"
+
+    def load(self, section: str):
+        """Return a section, fetching it if it is not loaded yet"""
+        if section not in self._sections:
+            result = getattr(self.source, SECTIONS[section])(self.fund_id)
+            with self._lock:
+                self._sections.setdefault(section, result)
+        return self._sections[section]
+
+    def prefetch(
+        self, fields: Iterable[str] = None, max_workers: int = 8
+    ) -> Dict[str, object]:
+        """
+        Load many sections concurrently, every section by default
+
+        Sections already loaded are not fetched again.
+        """
+        fields = list(SECTIONS) if fields is None else list(fields)
+        unknown = set(fields) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown fund sections: {sorted(unknown)}")
+        missing = [f for f in fields if f not in self._sections]
+        if missing:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(self.load, missing))
+        return {f: self._sections[f] for f in fields}
 
-    pass
+    def invalidate(self, fields: Iterable[str] = None):
+        """Drop loaded sections so they are fetched again on next access"""
+        with self._lock:
+            if fields is None:
+                self._sections.clear()
+            for f in fields or []:
+                self._sections.pop(f, None)
@@ -0,0 +1,145 @@
+from typing import Any, Dict, Iterable, List
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+import datetime
+import time
+
+from .crawler import CrawlReport
+from .sources import Sec
+from .store import Store
+from .utils._optional import import_optional_dependency
+from .utils.concurrent import imap
+
+# kind -> `Sec` getter taking the fund id and the period
+KINDS = {"full": "get_fund_full_port", "top5": "get_fund_top5_port"}
+
+# field names of the same value across FundPort and FundTop5 records
+_FIELDS = {
+    "security": ["secur_abbr", "issue_code", "asset_code", "asset_name"],
+    "name": ["asset_name", "asset_liab_desc", "secur_name", "issuer_name"],
+    "percent_nav": ["percent_nav", "asset_ratio", "ratio"],
+    "value": ["value", "market_value", "asset_value"],
+}
+
+
+def _first(record: Dict[str, Any], names: List[str]):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, "", "-"):
+            return value
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_holding(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a FundPort or FundTop5 record to the columns of the store"""
+    security = _first(record, _FIELDS["security"])
+    return {
+        "security": security.strip().upper() if security else None,
+        "name": _first(record, _FIELDS["name"]),
+        "percent_nav": _to_float(_first(record, _FIELDS["percent_nav"])),
+        "value": _to_float(_first(record, _FIELDS["value"])),
+        "data": record,
+    }
+
+
+def month_periods(start, end=None) -> List[str]:
+    """`YYYYMM` periods from `start` to `end` (default this month)"""
+    end = end or datetime.date.today()
+    year, month = start.year, start.month
+    periods = []
+    while (year, month) <= (end.year, end.month):
+        periods.append(f"{year}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def ingest_holdings(
+    source: Sec,
+    store: Store,
+    funds: Iterable[str],
+    periods: Iterable[str],
+    *,
+    kind: Literal["full", "top5"] = "top5",
+    max_workers: int = 8,
+) -> CrawlReport:
+    """
+    Fetch the holdings of every (fund, period) not in `store` yet
+
+    Pairs are fetched concurrently and each one is saved as it arrives,
+    periods without holdings included, so they are not asked again.
+
+    **Parameters:**
+
+    * **source** - `Sec` source
+    * **store** - `Store` the holdings are saved to
+    * **funds** - `proj_id` of the funds
+    * **periods** - `YYYYMM` periods, see `month_periods`
+    * **kind** - *(optional)* `"full"` portfolio or `"top5"` holdings
+    * **max_workers** - *(optional)* number of concurrent requests
+
+    **Returns:** `CrawlReport`
+
+    Usage:
+    ```
+    >>> from pythainav.holdings import ingest_holdings, month_periods
+    >>> from pythainav.store import Store
+
+    >>> store = Store("pythainav.db")
+    >>> ingest_holdings(sec, store, funds, month_periods(date(2019, 1, 1)))
+    >>> store.read_holdings(security="PTT", period="202001")["fund"]
+    ['M0012_2547', 'M0345_2553', ...]
+    ```
+    """
+    started = time.perf_counter()
+    getter = getattr(source, KINDS[kind])
+    funds, periods = list(funds), list(periods)
+    report = CrawlReport(funds=len(funds))
+
+    done = store.holding_periods(kind)
+    todo = [
+        (fund, period)
+        for fund in funds
+        for period in periods
+        if (fund, period) not in done
+    ]
+    report.skipped = len(funds) * len(periods) - len(todo)
+    if todo:
+        source.key_pools["fundfactsheet"].reserve(len(todo))
+
+    def fetch(job):
+        fund, period = job
+        try:
+            records = getter(fund, period) or []
+        except Exception as e:
+            return job, e
+        store.write_holdings(
+            fund, period, kind, [normalize_holding(r) for r in records]
+        )
+        return job, None
+
+    for (fund, period), error in imap(
+        fetch, todo, max_workers=max_workers, ordered=False
+    ):
+        if error is None:
+            report.fetched += 1
+        else:
+            report.errors[f"{fund}/{period}"] = repr(error)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def holdings_frame(store: Store, **filters):
+    """`Store.read_holdings` as a `pd.DataFrame`"""
+    pd = import_optional_dependency("pandas")
+    return pd.DataFrame(store.read_holdings(**filters))
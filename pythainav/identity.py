@@ -0,0 +1,178 @@
+from typing import Dict, List, Optional
+
+import json
+import sqlite3
+import threading
+import time
+
+from .search import FundIndex, _normalize, load_records
+from .sources import parse_class_remark
+
+COLUMNS = ["code", "finnomena_id", "proj_id", "parent", "name_th", "name_en"]
+
+
+class IdentityMap:
+    """Persisted table linking fund identifiers across sources
+
+    Each row is a fund or share class code with its Finnomena id, SEC
+    `proj_id` and, for share classes, the parent fund code. It is built once
+    in bulk with `refresh` and later refreshes only write rows that changed.
+
+    An `IdentityMap` can be passed as `index` to `Finnomena` and `Sec` so
+    names are resolved with zero network calls.
+
+    Usage:
+    ```
+    >>> from pythainav.identity import IdentityMap
+    >>> from pythainav.sources import Finnomena, Sec
+
+    >>> ids = IdentityMap("funds.db")
+    >>> ids.refresh(finnomena=Finnomena(), sec=Sec(subscription_key=key))
+    >>> ids.resolve("KT-PRECIOUS", source="sec")
+    'M0123_2553'
+    >>> nav.get("KT-PRECIOUS", source=Sec(subscription_key=key, index=ids))
+    ```
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fund_identity (
+                    code TEXT PRIMARY KEY,
+                    finnomena_id TEXT,
+                    proj_id TEXT,
+                    parent TEXT,
+                    name_th TEXT,
+                    name_en TEXT,
+                    sec TEXT,
+                    updated_at REAL
+                )
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS fund_identity_proj_id "
+                "ON fund_identity (proj_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS fund_identity_finnomena_id "
+                "ON fund_identity (finnomena_id)"
+            )
+        # rows are small and few (a few thousand), keep them all in memory
+        self._rows = {r["code"]: r for r in self._select()}
+
+    def _select(self, where: str = "", params=()) -> List[Dict]:
+        cursor = self._conn.execute(
+            f"SELECT {', '.join(COLUMNS)}, sec FROM fund_identity {where}",
+            params,
+        )
+        rows = []
+        for row in cursor:
+            record = {k: v for k, v in zip(COLUMNS, row) if v is not None}
+            if row[-1] is not None:
+                record["sec"] = json.loads(row[-1])
+            rows.append(record)
+        return rows
+
+    def upsert(self, records: List[Dict]) -> int:
+        """Write records that are new or changed, merging with stored rows"""
+        changed = []
+        with self._lock:
+            for record in records:
+                code = _normalize(record["code"])
+                current = self._rows.get(code, {})
+                merged = {**current, **record, "code": code}
+                if merged != current:
+                    changed.append(merged)
+                    self._rows[code] = merged
+            if changed:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO fund_identity "
+                        f"({', '.join(COLUMNS)}, sec, updated_at) "
+                        f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                        [
+                            [r.get(k) for k in COLUMNS]
+                            + [
+                                (
+                                    json.dumps(r["sec"], ensure_ascii=False)
+                                    if "sec" in r
+                                    else None
+                                ),
+                                now,
+                            ]
+                            for r in changed
+                        ],
+                    )
+        return len(changed)
+
+    def refresh(self, finnomena=None, sec=None) -> int:
+        """Bulk load the fund lists of the given sources
+
+        **Returns:** number of rows added or changed
+        """
+        return self.upsert(load_records(finnomena, sec))
+
+    def add_classes(self, proj_id: str, remark_en: str) -> int:
+        """Learn share class codes from a multi class `remark_en` string"""
+        parents = [
+            r for r in self.by_proj_id(proj_id) if "parent" not in r
+        ] or [{}]
+        parent = parents[0]
+        records = [
+            {
+                "code": code,
+                "proj_id": proj_id,
+                "parent": parent.get("code"),
+                "sec": parent.get("sec"),
+            }
+            for code in parse_class_remark(remark_en)
+        ]
+        return self.upsert(
+            [{k: v for k, v in r.items() if v is not None} for r in records]
+        )
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, code: str):
+        return _normalize(code) in self._rows
+
+    def get(self, code: str) -> Optional[Dict]:
+        return self._rows.get(_normalize(code))
+
+    def records(self) -> List[Dict]:
+        return list(self._rows.values())
+
+    def by_proj_id(self, proj_id: str) -> List[Dict]:
+        return [r for r in self._rows.values() if r.get("proj_id") == proj_id]
+
+    def by_finnomena_id(self, finnomena_id: str) -> Optional[Dict]:
+        for r in self._rows.values():
+            if r.get("finnomena_id") == finnomena_id:
+                return r
+        return None
+
+    def classes(self, code: str) -> List[str]:
+        code = _normalize(code)
+        return sorted(
+            r["code"] for r in self._rows.values() if r.get("parent") == code
+        )
+
+    def resolve(self, name: str, source: str = "sec") -> Optional[str]:
+        """Identifier of a fund for a source, `"sec"` or `"finnomena"`"""
+        key = {"sec": "proj_id", "finnomena": "finnomena_id"}[source]
+        record = self.get(name)
+        if record is None:
+            return None
+        if key not in record and "parent" in record:
+            record = self.get(record["parent"]) or record
+        return record.get(key)
+
+    def to_index(self, **kargs) -> FundIndex:
+        return FundIndex(self.records(), **kargs)
+
+    def close(self):
+        self._conn.close()
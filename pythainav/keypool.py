@@ -0,0 +1,287 @@
+from typing import Dict, List, Optional, Union
+
+import math
+import threading
+import time
+from collections import deque
+
+# windows reported by `KeyPool.usage`
+WINDOWS = {"minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+
+class NoAvailableKey(Exception):
+    """Every key of a pool is out of quota or unauthorized"""
+
+
+class BudgetExceeded(Exception):
+    """A bulk operation needs more requests than the budget has left"""
+
+    def __init__(self, needed: int, remaining: int, eta: float):
+        self.needed = needed
+        self.remaining = remaining
+        self.eta = eta
+        super().__init__(
+            f"needs {needed} requests but only {remaining} are left, "
+            f"it would take about {eta / 60:.0f} minutes within the budget"
+        )
+
+
+class KeyPool:
+    """Pool of subscription keys of one API product
+
+    Requests are spread over the keys, each key is limited to `rate`
+    requests per second and `quota` requests per `quota_period` seconds.
+    A key answered with 429 is sidelined for `Retry-After` or `cooldown`
+    seconds, a key answered with 401 or 403 for `unauthorized_cooldown`
+    seconds.
+
+    A pool wide `budget` of requests per `budget_period` seconds can be set
+    on top of that. Once it is spent, requests wait for the window to slide
+    when `pace` is True, else `BudgetExceeded` is raised. Bulk operations
+    call `reserve` first to fail fast before starting.
+
+    **Parameters:**
+
+    * **keys** - subscription keys
+    * **rate** - *(optional)* maximum requests per second of each key
+    * **quota** - *(optional)* maximum requests of each key per period
+    * **quota_period** - *(optional)* length of the quota period in seconds
+    * **cooldown** - *(optional)* seconds a throttled key is sidelined
+    * **budget** - *(optional)* maximum requests of the pool per period
+    * **budget_period** - *(optional)* length of the budget window in seconds
+    * **pace** - *(optional)* wait instead of failing when over budget
+
+    Usage:
+    ```
+    >>> from pythainav.keypool import KeyPool
+    >>> from pythainav.sources import Sec
+
+    >>> sec = Sec(subscription_key={
+    ...     "fundfactsheet": KeyPool(["key1", "key2"], rate=5),
+    ...     "funddailyinfo": ["key3", "key4", "key5"],
+    ... })
+    >>> sec.key_pools["funddailyinfo"].stats()
+    {'key3': {'requests': 120, 'throttled': 0, ...}, ...}
+    ```
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        rate: Optional[float] = None,
+        quota: Optional[int] = None,
+        quota_period: float = 24 * 60 * 60,
+        cooldown: float = 60,
+        unauthorized_cooldown: float = 60 * 60,
+        budget: Optional[int] = None,
+        budget_period: float = 60 * 60,
+        pace: bool = True,
+    ):
+        if not keys:
+            raise ValueError("Must specify at least one key")
+        self.keys = list(dict.fromkeys(keys))
+        self.rate = rate
+        self.quota = quota
+        self.quota_period = quota_period
+        self.cooldown = cooldown
+        self.unauthorized_cooldown = unauthorized_cooldown
+        self.budget = budget
+        self.budget_period = budget_period
+        self.pace = pace
+
+        now = time.monotonic()
+        self._next_at = {key: now for key in self.keys}
+        self._sidelined: Dict[str, float] = {}
+        self._unauthorized = set()
+        self._period_start = {key: now for key in self.keys}
+        self._used = {key: 0 for key in self.keys}
+        self._stats = {
+            key: {"requests": 0, "throttled": 0, "unauthorized": 0}
+            for key in self.keys
+        }
+        # (time, key) of requests of the largest window, oldest first
+        self._log = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_value(cls, value: Union[str, List[str], "KeyPool"]) -> "KeyPool":
+        if isinstance(value, KeyPool):
+            return value
+        if isinstance(value, str):
+            return cls([value])
+        return cls(list(value))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _remaining(self, key: str, now: float) -> float:
+        if now - self._period_start[key] >= self.quota_period:
+            self._period_start[key] = now
+            self._used[key] = 0
+        if self.quota is None:
+            return float("inf")
+        return self.quota - self._used[key]
+
+    def _trim(self, now: float):
+        horizon = max(self.budget_period, *WINDOWS.values())
+        while self._log and self._log[0][0] <= now - horizon:
+            self._log.popleft()
+
+    def _in_window(self, now: float, window: float) -> int:
+        # the log is short enough that a reverse scan is cheap
+        count = 0
+        for at, _ in reversed(self._log):
+            if at <= now - window:
+                break
+            count += 1
+        return count
+
+    def _budget_left(self, now: float) -> float:
+        if self.budget is None:
+            return float("inf")
+        return self.budget - self._in_window(now, self.budget_period)
+
+    def _budget_wait(self, now: float, needed: int = 1) -> float:
+        """Seconds until `needed` more requests fit in the budget window"""
+        over = needed - self._budget_left(now)
+        if over <= 0:
+            return 0.0
+        inside = [at for at, _ in self._log if at > now - self.budget_period]
+        if over <= len(inside):
+            return inside[over - 1] + self.budget_period - now
+        # more than a whole window, assume full windows from now on
+        return math.ceil(needed / self.budget) * self.budget_period
+
+    def reserve(self, needed: int) -> float:
+        """Check that `needed` requests fit before a bulk operation starts
+
+        **Returns:** estimated seconds the requests will be paced for
+
+        Raises `BudgetExceeded` when they don't fit and `pace` is False, or
+        when they exceed the quota left on the keys.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            quota = sum(
+                self._remaining(key, now)
+                for key in self.keys
+                if key not in self._unauthorized
+            )
+            eta = self._budget_wait(now, needed)
+            if needed > quota:
+                raise BudgetExceeded(needed, int(quota), eta)
+            if eta and not self.pace:
+                raise BudgetExceeded(needed, int(self._budget_left(now)), eta)
+            return eta
+
+    def acquire(self) -> str:
+        """Take a key, waiting for its rate limit slot"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._trim(now)
+                key = self._pick(now)
+                if key is not None:
+                    at = max(now, self._next_at[key])
+                    if self.rate:
+                        self._next_at[key] = at + 1 / self.rate
+                    self._used[key] += 1
+                    self._stats[key]["requests"] += 1
+                    self._log.append((now, key))
+                    break
+                wait = self._wait(now)
+            time.sleep(wait)
+        if at > now:
+            time.sleep(at - now)
+        return key
+
+    def _pick(self, now: float) -> Optional[str]:
+        if self._budget_left(now) <= 0:
+            return None
+        usable = [
+            key
+            for key in self.keys
+            if self._sidelined.get(key, 0) <= now
+            and self._remaining(key, now) > 0
+        ]
+        if not usable:
+            return None
+        return min(usable, key=self._next_at.__getitem__)
+
+    def _wait(self, now: float) -> float:
+        budget_wait = self._budget_wait(now)
+        if budget_wait:
+            if not self.pace:
+                raise BudgetExceeded(1, 0, budget_wait)
+            return budget_wait
+        # throttled keys come back soon, wait for the first one
+        back_at = [
+            self._sidelined[key]
+            for key in self.keys
+            if key not in self._unauthorized
+            and self._sidelined.get(key, 0) > now
+            and self._remaining(key, now) > 0
+        ]
+        if not back_at:
+            raise NoAvailableKey(
+                f"none of {len(self.keys)} keys is usable, "
+                f"{len(self._unauthorized)} unauthorized"
+            )
+        return min(back_at) - now
+
+    def release(self, key: str, status: int, retry_after: float = None):
+        """Record the response status of a request made with `key`"""
+        with self._lock:
+            now = time.monotonic()
+            if status == 429:
+                self._stats[key]["throttled"] += 1
+                cooldown = self.cooldown if retry_after is None else retry_after
+                self._sidelined[key] = now + cooldown
+                self._unauthorized.discard(key)
+            elif status in (401, 403):
+                self._stats[key]["unauthorized"] += 1
+                self._sidelined[key] = now + self.unauthorized_cooldown
+                self._unauthorized.add(key)
+            else:
+                self._unauthorized.discard(key)
+
+    def usage(self) -> Dict[str, object]:
+        """Requests made in the last minute, hour and day, in total and by key
+
+        Usage:
+        ```
+        >>> sec.key_pools["funddailyinfo"].usage()
+        {'minute': 58, 'hour': 2210, 'day': 2210, 'budget_left': 790,
+         'keys': {'key3': {'minute': 20, 'hour': 737, 'day': 737}, ...}}
+        ```
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            usage = {
+                name: self._in_window(now, window)
+                for name, window in WINDOWS.items()
+            }
+            usage["budget_left"] = self._budget_left(now)
+            keys = {key: dict.fromkeys(WINDOWS, 0) for key in self.keys}
+            for at, key in self._log:
+                for name, window in WINDOWS.items():
+                    if at > now - window:
+                        keys[key][name] += 1
+            usage["keys"] = keys
+            return usage
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: {
+                    **self._stats[key],
+                    "remaining": self._remaining(key, now),
+                    "sidelined_for": max(
+                        0.0, self._sidelined.get(key, 0) - now
+                    ),
+                }
+                for key in self.keys
+            }
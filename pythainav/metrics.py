@@ -0,0 +1,212 @@
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+
+from .nav import Nav
+
+
+class Accumulator(ABC):
+    """Base class of streaming metrics that are updated one NAV at a time
+
+    Every subclass keeps only the state it needs for its window so that
+    `update` costs O(1) (amortised) no matter how long the history is.
+    """
+
+    def __init__(self):
+        self.last_updated = None
+        self.count = 0
+
+    def update(self, nav: Union[Nav, float]):
+        """Feed a new observation, a `Nav` or a plain value
+
+        Navs that are not newer than the last one seen are ignored so the
+        same daily `get` result can be fed more than once.
+        """
+        if isinstance(nav, Nav):
+            if (
+                self.last_updated is not None
+                and nav.updated <= self.last_updated
+            ):
+                return self
+            self.last_updated = nav.updated
+            value = nav.value
+        else:
+            value = nav
+        value = float(value)
+        self.count += 1
+        self._push(value)
+        return self
+
+    def seed(self, navs: Iterable[Union[Nav, float]]):
+        """Replay a stored history, oldest first"""
+        if navs and isinstance(navs, list) and isinstance(navs[0], Nav):
+            navs = sorted(navs, key=lambda x: x.updated)
+        for nav in navs:
+            self.update(nav)
+        return self
+
+    @abstractmethod
+    def _push(self, value: float):
+        pass
+
+    @property
+    @abstractmethod
+    def value(self) -> Optional[float]:
+        pass
+
+
+class RollingReturn(Accumulator):
+    """Simple return over the last `window` observations"""
+
+    def __init__(self, window: int):
+        super().__init__()
+        if window < 1:
+            raise ValueError("window must be a positive integer")
+        self.window = window
+        self._values = deque(maxlen=window + 1)
+
+    def _push(self, value: float):
+        self._values.append(value)
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self._values) <= self.window or self._values[0] == 0:
+            return None
+        return self._values[-1] / self._values[0] - 1
+
+
+class RollingVolatility(Accumulator):
+    """Standard deviation of daily returns over the last `window` returns
+
+    **Parameters:**
+
+    * **window** - number of daily returns in the window
+    * **annualize** - *(optional)* periods per year used to scale the
+    result, e.g. `250`. Default to no scaling.
+    """
+
+    def __init__(self, window: int, annualize: Optional[int] = None):
+        super().__init__()
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self.annualize = annualize
+        self._previous = None
+        self._returns = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def _push(self, value: float):
+        previous, self._previous = self._previous, value
+        if previous is None or previous == 0:
+            return
+        ret = value / previous - 1
+        self._returns.append(ret)
+        self._sum += ret
+        self._sum_sq += ret * ret
+        if len(self._returns) > self.window:
+            old = self._returns.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+
+    @property
+    def value(self) -> Optional[float]:
+        n = len(self._returns)
+        if n < self.window:
+            return None
+        mean = self._sum / n
+        # clamp tiny negative values caused by floating point cancellation
+        variance = max(self._sum_sq / n - mean * mean, 0.0) * n / (n - 1)
+        std = math.sqrt(variance)
+        if self.annualize:
+            std *= math.sqrt(self.annualize)
+        return std
+
+
+class Drawdown(Accumulator):
+    """Current and maximum drawdown from the running peak
+
+    With `window` the peak is the highest value of the last `window`
+    observations (kept with a monotonic deque), otherwise the all-time peak.
+    """
+
+    def __init__(self, window: Optional[int] = None):
+        super().__init__()
+        self.window = window
+        self._peaks = deque()
+        self._peak = None
+        self.current = None
+        self.max_drawdown = 0.0
+
+    def _push(self, value: float):
+        if self.window:
+            while self._peaks and self._peaks[-1][1] <= value:
+                self._peaks.pop()
+            self._peaks.append((self.count, value))
+            if self._peaks[0][0] <= self.count - self.window:
+                self._peaks.popleft()
+            peak = self._peaks[0][1]
+        else:
+            if self._peak is None or value > self._peak:
+                self._peak = value
+            peak = self._peak
+        self.current = value / peak - 1 if peak else 0.0
+        self.max_drawdown = min(self.max_drawdown, self.current)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.current
+
+
+class RollingMetrics:
+    """Rolling return and volatility for several windows plus drawdown
+
+    Usage:
+    ```
+    >>> import pythainav as nav
+    >>> from pythainav.metrics import RollingMetrics
+
+    >>> metrics = RollingMetrics().seed(nav.get_all("KT-PRECIOUS"))
+    >>> metrics.update(nav.get("KT-PRECIOUS")).values()
+    {'return_30': 0.0123, 'volatility_30': 0.0081, ..., 'drawdown': -0.21}
+    ```
+    """
+
+    def __init__(
+        self,
+        windows: Sequence[int] = (30, 90, 250),
+        annualize: Optional[int] = None,
+    ):
+        self.returns = {w: RollingReturn(w) for w in windows}
+        self.volatilities = {
+            w: RollingVolatility(w, annualize=annualize) for w in windows
+        }
+        self.drawdown = Drawdown()
+
+    def _accumulators(self):
+        yield from self.returns.values()
+        yield from self.volatilities.values()
+        yield self.drawdown
+
+    def update(self, nav: Union[Nav, float]):
+        for acc in self._accumulators():
+            acc.update(nav)
+        return self
+
+    def seed(self, navs: Iterable[Union[Nav, float]]):
+        navs = list(navs)
+        for acc in self._accumulators():
+            acc.seed(navs)
+        return self
+
+    def values(self) -> Dict[str, Optional[float]]:
+        result = {}
+        for w, acc in self.returns.items():
+            result[f"return_{w}"] = acc.value
+        for w, acc in self.volatilities.items():
+            result[f"volatility_{w}"] = acc.value
+        result["drawdown"] = self.drawdown.value
+        result["max_drawdown"] = self.drawdown.max_drawdown
+        return result
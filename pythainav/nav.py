@@ -1,8 +1,11 @@
-from typing import Set
+from typing import Dict, List, Set
 
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from datetime import datetime
 
+from .utils._optional import import_optional_dependency
+
 
 @dataclass
 class Nav:
@@ -12,3 +15,78 @@ class Nav:
     updated: datetime
     tags: Set[str]
     fund: str
+
+
+@dataclass
+class Snapshot:
+    """Latest NAV of many funds stored column by column with timing stats"""
+
+    fund: List[str] = field(default_factory=list)
+    value: List[float] = field(default_factory=list)
+    updated: List[datetime] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    requested: int = 0
+    elapsed: float = 0.0
+
+    def append(self, nav: Nav):
+        self.fund.append(nav.fund)
+        self.value.append(nav.value)
+        self.updated.append(nav.updated)
+
+    def __len__(self):
+        return len(self.fund)
+
+    @property
+    def rate(self) -> float:
+        """funds per second"""
+        return self.requested / self.elapsed if self.elapsed else 0.0
+
+    def navs(self) -> List[Nav]:
+        return [
+            Nav(value=value, updated=updated, tags={"latest"}, fund=fund)
+            for fund, value, updated in zip(self.fund, self.value, self.updated)
+        ]
+
+    def to_dataframe(self):
+        pd = import_optional_dependency("pandas")
+        return pd.DataFrame(
+            {"fund": self.fund, "value": self.value, "updated": self.updated}
+        )
+
+
+@dataclass
+class NavHistory:
+    """History of one fund stored column by column
+
+    Values are kept in typed arrays, much smaller than a list of `Nav`.
+    """
+
+    fund: str
+    updated: List[datetime] = field(default_factory=list)
+    value: array = field(default_factory=lambda: array("d"))
+    amount: array = field(default_factory=lambda: array("d"))
+
+    def append(self, updated: datetime, value: float, amount=None):
+        self.updated.append(updated)
+        self.value.append(value)
+        self.amount.append(float("nan") if amount is None else amount)
+
+    def __len__(self):
+        return len(self.updated)
+
+    def navs(self) -> List[Nav]:
+        navs = []
+        for updated, value, amount in zip(
+            self.updated, self.value, self.amount
+        ):
+            nav = Nav(value=value, updated=updated, tags={}, fund=self.fund)
+            nav.amount = amount
+            navs.append(nav)
+        return navs
+
+    def to_dataframe(self):
+        pd = import_optional_dependency("pandas")
+        return pd.DataFrame(
+            {"value": self.value, "amount": self.amount},
+            index=pd.DatetimeIndex(self.updated, name="updated"),
+        )
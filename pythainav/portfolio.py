@@ -0,0 +1,158 @@
+from typing import Iterable, List
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import _create_source, _get_history
+from .nav import Nav
+from .utils._optional import import_optional_dependency
+
+
+def _navs_to_frame(fund: str, navs: List[Nav]):
+    pd = import_optional_dependency("pandas")
+    return pd.DataFrame(
+        {
+            # a multi class answer holds rows of other classes than `fund`
+            "fund": [(nav.fund or fund).lower() for nav in navs],
+            "date": pd.to_datetime([nav.updated for nav in navs]),
+            "nav": [nav.value for nav in navs],
+        },
+        columns=["fund", "date", "nav"],
+    )
+
+
+def fetch_histories(
+    funds: Iterable[str],
+    *,
+    source="finnomena",
+    range: Literal[
+        "1D", "1W", "1M", "6M", "YTD", "1Y", "3Y", "5Y", "10Y", "MAX"
+    ] = "MAX",
+    max_workers: int = 8,
+    **kargs,
+):
+    """
+    Fetch the history of each fund exactly once, concurrently
+
+    **Returns:** `pd.DataFrame` with `fund`, `date` and `nav` columns sorted
+    by `date`
+    """
+    pd = import_optional_dependency("pandas")
+    _source = _create_source(source, **kargs)
+    funds = sorted({fund.lower() for fund in funds})
+
+    # names are resolved by the source when needed, Finnomena's cached
+    # fund list is downloaded once however many workers miss it together
+    def fetch(fund):
+        return _navs_to_frame(fund, _get_history(_source, fund, range) or [])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(fetch, funds))
+
+    prices = pd.concat(frames, ignore_index=True)
+    return prices.sort_values("date", kind="mergesort").reset_index(drop=True)
+
+
+def valuate(
+    holdings,
+    dates=None,
+    *,
+    source="finnomena",
+    range: Literal[
+        "1D", "1W", "1M", "6M", "YTD", "1Y", "3Y", "5Y", "10Y", "MAX"
+    ] = "MAX",
+    prices=None,
+    max_workers: int = 8,
+    **kargs,
+):
+    """
+    Value portfolios of fund units over time
+
+    **Parameters:**
+
+    * **holdings** - table (`pd.DataFrame` or list of dict) with `fund` and
+    `units` columns. When a `date` column is given each row is a transaction
+    that changes `units` from that date on, otherwise units are held for the
+    whole period. An optional `portfolio` column values many portfolios at
+    once.
+    * **dates** - *(optional)* valuation dates. Default to every date a NAV
+    is published for any of the funds.
+    * **source** - *(optional)* Data source for pull data.
+    * **range** - *(optional)* history to fetch for each fund, default to `"MAX"`
+    * **prices** - *(optional)* pre-fetched prices from `fetch_histories`,
+    skip fetching entirely.
+
+    **Returns:** `pd.DataFrame` with `date`, (`portfolio`), `fund`, `units`,
+    `nav` and `value` columns. NAV is taken as-of each date, i.e. the latest
+    NAV published on or before it.
+
+    Usage:
+    ```
+    >>> from pythainav.portfolio import valuate
+
+    >>> holdings = [
+    ...     {"fund": "KT-PRECIOUS", "units": 100, "date": "2020-01-02"},
+    ...     {"fund": "TISTECH-A", "units": 50, "date": "2020-03-01"},
+    ...     {"fund": "KT-PRECIOUS", "units": -40, "date": "2020-06-01"},
+    ... ]
+    >>> values = valuate(holdings)
+    >>> values.groupby("date")["value"].sum()
+    ```
+    """
+    pd = import_optional_dependency("pandas")
+
+    holdings = pd.DataFrame(holdings).copy()
+    holdings["fund"] = holdings["fund"].str.lower()
+    by = ["portfolio", "fund"] if "portfolio" in holdings else ["fund"]
+
+    if prices is None:
+        prices = fetch_histories(
+            holdings["fund"].unique(),
+            source=source,
+            range=range,
+            max_workers=max_workers,
+            **kargs,
+        )
+
+    if dates is None:
+        dates = prices["date"].unique()
+    dates = pd.DataFrame({"date": pd.to_datetime(dates)}).drop_duplicates()
+
+    # cumulative units held per (portfolio, fund) from each transaction date
+    if "date" in holdings:
+        holdings["date"] = pd.to_datetime(holdings["date"])
+    else:
+        holdings["date"] = dates["date"].min()
+    positions = holdings.sort_values("date", kind="mergesort")
+    positions["units"] = positions.groupby(by)["units"].cumsum()
+    positions = positions[by + ["date", "units"]]
+
+    grid = (
+        positions[by]
+        .drop_duplicates()
+        .assign(_key=0)
+        .merge(dates.assign(_key=0), on="_key")
+        .drop(columns="_key")
+        .sort_values("date", kind="mergesort")
+    )
+
+    result = pd.merge_asof(grid, positions, on="date", by=by)
+    result = pd.merge_asof(result, prices, on="date", by="fund")
+    result["units"] = result["units"].fillna(0.0)
+    result["value"] = result["units"] * result["nav"]
+
+    return result.sort_values(["date"] + by).reset_index(drop=True)
+
+
+def valuate_total(holdings, dates=None, **kargs):
+    """Total value time series of `valuate`, one column per portfolio"""
+    values = valuate(holdings, dates, **kargs)
+    if "portfolio" not in values:
+        return values.groupby("date")["value"].sum(min_count=1)
+    return values.pivot_table(
+        index="date", columns="portfolio", values="value", aggfunc="sum"
+    )
@@ -0,0 +1,190 @@
+from typing import Callable, Dict, Iterable, List, Optional
+
+import datetime
+import logging
+import threading
+import time
+
+from .api import _get_history, _source_name
+from .cache import recache
+from .nav import Nav
+from .sources import Source
+from .store import Store
+from .utils.date import BANGKOK, next_publication
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """Refresh latest NAVs when they are published
+
+    NAVs are published once per business day in the evening. Inside the
+    publication `window` the watchlist is polled, starting every
+    `min_interval` seconds and backing off by `backoff` up to `max_interval`
+    while nothing changes. Funds whose NAV changed are written to `store`,
+    their cached histories for `ranges` are refreshed and `on_change` is
+    called. Once every fund has today's NAV it sleeps until the next window.
+
+    **Parameters:**
+
+    * **source** - source to poll, e.g. `Finnomena()`
+    * **funds** - *(optional)* watchlist, default to the whole universe
+    * **store** - *(optional)* `Store` to write new NAVs to
+    * **source_name** - *(optional)* `source` column of the rows written to
+    `store`, default to the lower case class name, e.g. `"finnomena"`
+    * **ranges** - *(optional)* history ranges to refresh in the cache of
+    `source` for changed funds, e.g. `["1Y", "MAX"]`
+    * **window** - *(optional)* Bangkok times to poll between
+
+    Usage:
+    ```
+    >>> from pythainav.scheduler import RefreshScheduler
+    >>> from pythainav.sources import Finnomena
+
+    >>> scheduler = RefreshScheduler(Finnomena(), funds=["KT-PRECIOUS"])
+    >>> scheduler.start()  # background thread
+    >>> scheduler.last_refresh["kt-precious"]
+    {'checked_at': ..., 'changed_at': ..., 'nav_date': ..., 'seconds': 0.21}
+    ```
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        funds: Iterable[str] = None,
+        *,
+        store: Store = None,
+        source_name: str = None,
+        ranges: Iterable[str] = (),
+        on_change: Callable[[List[Nav]], None] = None,
+        window=(datetime.time(16, 0), datetime.time(23, 30)),
+        min_interval: float = 60,
+        max_interval: float = 30 * 60,
+        backoff: float = 2.0,
+        max_workers: int = 16,
+    ):
+        self.source = source
+        self.funds = [f.lower() for f in funds] if funds is not None else None
+        self.store = store
+        self.source_name = (
+            _source_name(source) if source_name is None else source_name
+        )
+        self.ranges = list(ranges)
+        self.on_change = on_change
+        self.window = window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_workers = max_workers
+
+        self.interval = min_interval
+        self.last_refresh: Dict[str, Dict[str, object]] = {}
+        self._latest: Dict[str, datetime.datetime] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _now(self) -> datetime.datetime:
+        return datetime.datetime.now(BANGKOK)
+
+    def run_once(self) -> List[Nav]:
+        """Poll every fund once and refresh the changed ones"""
+        started = time.perf_counter()
+        snapshot = self.source.snapshot(
+            self.funds, max_workers=self.max_workers
+        )
+        checked_at = self._now()
+        changed = []
+        for nav in snapshot.navs():
+            fund = nav.fund.lower()
+            info = self.last_refresh.setdefault(fund, {"changed_at": None})
+            info["checked_at"] = checked_at
+            if self._latest.get(fund) == nav.updated:
+                continue
+            self._latest[fund] = nav.updated
+            info["changed_at"] = checked_at
+            info["nav_date"] = nav.updated
+            changed.append(nav)
+
+        for nav in changed:
+            fund_started = time.perf_counter()
+            fund = nav.fund.lower()
+            if self.store is not None:
+                self.store.write_navs(fund, [nav], source=self.source_name)
+            for range in self.ranges:
+                try:
+                    self._refresh_history(fund, range)
+                except Exception:
+                    logger.exception("failed to refresh %s %s", fund, range)
+            self.last_refresh[fund]["seconds"] = (
+                time.perf_counter() - fund_started
+            )
+
+        if changed and self.on_change is not None:
+            self.on_change(changed)
+        logger.info(
+            "checked %d funds in %.1fs, %d changed, %d failed",
+            snapshot.requested,
+            time.perf_counter() - started,
+            len(changed),
+            len(snapshot.errors),
+        )
+        return changed
+
+    def _refresh_history(self, fund: str, range: str):
+        if hasattr(type(self.source).get_range, "uncached"):
+            recache(self.source, "get_range", fund, range=range)
+        else:
+            # histories not cached as a whole (Sec caches each day) only
+            # need their new days fetched
+            _get_history(self.source, fund, range)
+
+    def _in_window(self, now: datetime.datetime) -> bool:
+        start, end = self.window
+        # nothing is published on weekends
+        return now.weekday() < 5 and start <= now.time() <= end
+
+    def _all_published(self, now: datetime.datetime) -> bool:
+        if not self._latest:
+            return False
+        today = now.date()
+        return all(d.date() >= today for d in self._latest.values())
+
+    def next_delay(self, changed: bool) -> float:
+        """Seconds to wait before the next poll"""
+        now = self._now()
+        if self._in_window(now) and not self._all_published(now):
+            if changed:
+                # more funds are likely publishing right now
+                self.interval = self.min_interval
+            else:
+                self.interval = min(
+                    self.interval * self.backoff, self.max_interval
+                )
+            return self.interval
+
+        self.interval = self.min_interval
+        start = next_publication(now, at=self.window[0])
+        return (start - now).total_seconds()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                changed = bool(self.run_once())
+            except Exception:
+                logger.exception("refresh failed")
+                changed = False
+            self._stop.wait(self.next_delay(changed))
+
+    def start(self) -> threading.Thread:
+        """Run in a daemon thread embedded in the current process"""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run_forever, name="pythainav-refresh", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,233 @@
+from typing import Callable, Dict, List, Optional
+
+import bisect
+import difflib
+import json
+import logging
+import threading
+import time
+
+from .utils._optional import import_optional_dependency
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def load_records(finnomena=None, sec=None) -> List[Dict]:
+    """
+    Build index records from the fund lists of the given sources
+
+    Records are merged on the (case insensitive) fund code, so a fund listed
+    by both sources carries both `finnomena_id` and `proj_id`.
+    """
+    records = {}
+
+    def record(code):
+        code = _normalize(code)
+        return records.setdefault(code, {"code": code})
+
+    if finnomena is not None:
+        for code, fund in finnomena.list().items():
+            r = record(code)
+            r["finnomena_id"] = fund["id"]
+            for key in ["name_th", "name_en"]:
+                if fund.get(key):
+                    r.setdefault(key, fund[key])
+
+    if sec is not None:
+        for fund in sec.list() or []:
+            r = record(fund["proj_abbr_name"])
+            r["proj_id"] = fund["proj_id"]
+            r["name_th"] = fund.get("proj_name_th") or r.get("name_th")
+            r["name_en"] = fund.get("proj_name_en") or r.get("name_en")
+            r["sec"] = fund
+        for fund_class in sec.search_class_fund("") or []:
+            r = record(fund_class["class_abbr_name"])
+            r["proj_id"] = fund_class["proj_id"]
+            r["parent"] = _normalize(fund_class["proj_abbr_name"])
+            r["sec"] = fund_class
+
+    return list(records.values())
+
+
+class FundIndex:
+    """In-memory search index over the fund universe
+
+    Resolves fund codes exactly, by prefix or by fuzzy Thai/English name
+    without any network call. When built with a `loader` the records are
+    reloaded at most once every `refresh_interval` seconds by a background
+    thread, started by the first lookup after they went stale. Lookups keep
+    answering from the current records while it runs.
+
+    Usage:
+    ```
+    >>> from pythainav.search import FundIndex
+    >>> from pythainav.sources import Finnomena, Sec
+
+    >>> index = FundIndex.from_sources(finnomena=Finnomena(), sec=Sec(key))
+    >>> index.get("KT-PRECIOUS")
+    {'code': 'kt-precious', 'finnomena_id': 'F00000...', 'proj_id': 'M0...'}
+    >>> index.search("ทองคำ")
+    [...]
+    >>> index.save("funds.json")
+    ```
+    """
+
+    def __init__(
+        self,
+        records: List[Dict] = None,
+        *,
+        loader: Callable[[], List[Dict]] = None,
+        refresh_interval: float = 24 * 60 * 60,
+    ):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.built_at = None
+        self._lock = threading.Lock()
+        self._refresher_lock = threading.Lock()
+        self._refresher = None
+        self._build(records or [])
+        if loader is not None and not records:
+            # nothing loaded yet, stale until the first lookup loads it
+            self.built_at = None
+
+    @classmethod
+    def from_sources(cls, finnomena=None, sec=None, **kargs):
+        index = cls(loader=lambda: load_records(finnomena, sec), **kargs)
+        index.refresh()
+        return index
+
+    def _build(self, records: List[Dict]):
+        codes = {}
+        names = {}
+        for r in records:
+            codes.setdefault(_normalize(r["code"]), r)
+            for key in ["name_th", "name_en"]:
+                if r.get(key):
+                    names.setdefault(_normalize(r[key]), r)
+        # swap whole structures so readers never see a half built index
+        self.records = records
+        self._codes = codes
+        self._sorted_codes = sorted(codes)
+        self._names = names
+        self.built_at = time.time()
+
+    def refresh(self):
+        """Reload records from `loader` now"""
+        if self.loader is None:
+            raise ValueError("index has no loader to refresh from")
+        with self._lock:
+            self._build(self.loader())
+
+    @property
+    def stale(self) -> bool:
+        if self.built_at is None:
+            return True
+        return time.time() - self.built_at > self.refresh_interval
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            # another thread may have reloaded while this one waited
+            if self.stale:
+                self._build(self.loader())
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh_if_stale()
+        except Exception:
+            logger.exception("fund index refresh failed, keeping old records")
+
+    def _maybe_refresh(self):
+        if self.loader is None or not self.stale:
+            return
+        if not self.records:
+            # nothing to answer from yet, load before the lookup
+            self._refresh_if_stale()
+            return
+        with self._refresher_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_in_background,
+                name="pythainav-index-refresh",
+                daemon=True,
+            )
+            self._refresher.start()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, code: str):
+        return self.get(code) is not None
+
+    def get(self, code: str) -> Optional[Dict]:
+        """Exact, case insensitive, lookup of a fund or class code"""
+        self._maybe_refresh()
+        return self._codes.get(_normalize(code))
+
+    def prefix(self, text: str, limit: int = 10) -> List[Dict]:
+        self._maybe_refresh()
+        text = _normalize(text)
+        start = bisect.bisect_left(self._sorted_codes, text)
+        result = []
+        for code in self._sorted_codes[start:]:
+            if not code.startswith(text) or len(result) >= limit:
+                break
+            result.append(self._codes[code])
+        return result
+
+    def fuzzy(
+        self, text: str, limit: int = 5, score_cutoff: int = 60
+    ) -> List[Dict]:
+        """Best matches on fund codes and Thai/English names"""
+        self._maybe_refresh()
+        text = _normalize(text)
+        choices = {**self._names, **self._codes}
+        process = import_optional_dependency(
+            "fuzzywuzzy.process", raise_on_missing=False
+        )
+        if process is not None:
+            matches = [
+                m
+                for m, _ in process.extractBests(
+                    text, list(choices), score_cutoff=score_cutoff, limit=None
+                )
+            ]
+        else:
+            matches = difflib.get_close_matches(
+                text, list(choices), n=len(choices), cutoff=score_cutoff / 100
+            )
+        result = []
+        for m in matches:
+            r = choices[m]
+            if all(r is not x for x in result):
+                result.append(r)
+            if len(result) >= limit:
+                break
+        return result
+
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        """Exact match first, then prefix matches, then fuzzy matches"""
+        exact = self.get(text)
+        if exact is not None:
+            return [exact]
+        return self.prefix(text, limit) or self.fuzzy(text, limit)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"built_at": self.built_at, "records": self.records},
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path: str, **kargs):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["records"], **kargs)
+        index.built_at = data["built_at"]
+        return index
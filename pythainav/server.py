@@ -0,0 +1,261 @@
+from typing import Any, Dict, List, Tuple
+
+import asyncio
+import bisect
+import datetime
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from .api import _create_source, _get_history
+from .nav import Nav
+from .sources import Sec
+from .store import Store, _to_date
+from .utils.date import business_days_before
+
+logger = logging.getLogger(__name__)
+
+# weekdays `asof` asks Sec for, enough to cover holidays
+ASOF_PROBE_DAYS = 5
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Error"}
+
+
+class QueryError(Exception):
+    """A query that can't be answered, sent back as a 400"""
+
+
+def _nav_to_dict(nav) -> Any:
+    if isinstance(nav, list):
+        return [_nav_to_dict(n) for n in nav]
+    if not isinstance(nav, Nav):
+        return nav
+    amount = getattr(nav, "amount", None)
+    return {
+        "fund": nav.fund,
+        "value": nav.value,
+        "updated": _to_date(nav.updated),
+        "amount": amount if amount == amount else None,
+    }
+
+
+class NavService:
+    """Asyncio HTTP service answering NAV queries from one warm process
+
+    Queries run on a thread pool against one source, so its cache is shared
+    by every client, and identical queries in flight at the same time are
+    answered by a single call. Standard library only.
+
+    Endpoints, all answering JSON:
+
+    * `GET /latest?fund=KT-PRECIOUS`
+    * `GET /history?fund=KT-PRECIOUS&range=1Y`
+    * `GET /asof?fund=KT-PRECIOUS&date=2020-01-15`, latest NAV on or before
+    the date, read from `store` when it has one, else from the source
+    * `POST /batch` with `[{"op": "latest", "fund": "..."}, ...]`
+    * `GET /metrics`, latency per endpoint and coalesced queries
+
+    **Parameters:**
+
+    * **source** - *(optional)* source name or object
+    * **store** - *(optional)* `Store` used by `asof`
+    * **max_workers** - *(optional)* threads running source calls
+
+    Usage:
+    ```
+    >>> from pythainav.server import NavService
+
+    >>> asyncio.run(NavService("finnomena").serve(port=8080))
+
+    $ curl "localhost:8080/latest?fund=KT-PRECIOUS"
+    {"fund": "KT-PRECIOUS", "value": 4.2696, "updated": "2020-01-20", ...}
+    ```
+    """
+
+    def __init__(
+        self,
+        source="finnomena",
+        store: Store = None,
+        max_workers: int = 16,
+        **kargs,
+    ):
+        self.source = _create_source(source, **kargs)
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pythainav-server"
+        )
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._latencies = defaultdict(lambda: deque(maxlen=1024))
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self.coalesced = 0
+        self.ops = {
+            "latest": self.latest,
+            "history": self.history,
+            "asof": self.asof,
+        }
+
+    def latest(self, fund: str):
+        return self.source.get(fund)
+
+    def history(self, fund: str, range: str = "1Y"):
+        return _get_history(self.source, fund, range) or []
+
+    def asof(self, fund: str, date: str):
+        date = _to_date(date)
+        nav = self.store.asof(fund, date) if self.store else None
+        if nav is not None:
+            return nav
+        if isinstance(self.source, Sec):
+            # a few days back from the date, not one request per business
+            # day since inception
+            day = datetime.date.fromisoformat(date)
+            for day in business_days_before(day, ASOF_PROBE_DAYS):
+                nav = self.source.get(fund, date=day)
+                if nav:
+                    return nav
+            return None
+        # sorted copy, the history may be a cached list
+        navs = sorted(
+            _get_history(self.source, fund, "MAX") or [],
+            key=lambda nav: _to_date(nav.updated),
+        )
+        dates = [_to_date(nav.updated) for nav in navs]
+        index = bisect.bisect_right(dates, date)
+        return navs[index - 1] if index else None
+
+    async def query(self, op: str, **params) -> Any:
+        """Answer a query, sharing the call with identical ones in flight"""
+        if op not in self.ops:
+            raise QueryError(f"unknown op {op!r}")
+        if "fund" not in params:
+            raise QueryError("missing fund")
+        key = (op, *sorted(params.items()))
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, lambda: _nav_to_dict(self.ops[op](**params))
+        )
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def batch(self, queries: List[Dict[str, Any]]) -> List[Any]:
+        async def one(query):
+            query = dict(query)
+            try:
+                return {"result": await self.query(query.pop("op"), **query)}
+            except Exception as e:
+                return {"error": repr(e)}
+
+        return await asyncio.gather(*(one(q) for q in queries))
+
+    def metrics(self) -> Dict[str, Any]:
+        endpoints = {}
+        for name, latencies in self._latencies.items():
+            ordered = sorted(latencies)
+            endpoints[name] = {
+                "requests": self._counts[name],
+                "errors": self._errors[name],
+                "mean_ms": 1000 * sum(ordered) / len(ordered),
+                "p50_ms": 1000 * ordered[len(ordered) // 2],
+                "p95_ms": 1000 * ordered[int(len(ordered) * 0.95)],
+                "max_ms": 1000 * ordered[-1],
+            }
+        return {
+            "endpoints": endpoints,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """Route a request, returns the status and the JSON body"""
+        url = urlsplit(target)
+        name = url.path.strip("/")
+        params = dict(parse_qsl(url.query))
+        if name == "metrics":
+            return 200, self.metrics()
+
+        started = time.perf_counter()
+        try:
+            if name == "batch" and method == "POST":
+                queries = json.loads(body or b"[]")
+                if not isinstance(queries, list):
+                    raise QueryError("batch body must be a list of queries")
+                result = await self.batch(queries)
+            elif name in self.ops and method == "GET":
+                result = await self.query(name, **params)
+            else:
+                return 404, {"error": f"no endpoint {method} /{name}"}
+            if result is None:
+                status, result = 404, {"error": "no data"}
+            else:
+                status = 200
+        except (QueryError, ValueError, TypeError) as e:
+            status, result = 400, {"error": str(e)}
+        except Exception as e:
+            logger.exception("query %s failed", target)
+            status, result = 500, {"error": repr(e)}
+
+        self._latencies[name].append(time.perf_counter() - started)
+        self._counts[name] += 1
+        if status >= 400:
+            self._errors[name] += 1
+        return status, result
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, result = await self.dispatch(method, target, body)
+                payload = json.dumps(result, ensure_ascii=False).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"
+                    "\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        """Start listening, returns the `asyncio.Server`"""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        server = await self.start(host, port)
+        logger.info("serving on %s", server.sockets[0].getsockname())
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,24 +1,130 @@
-from typing import List
+from typing import Dict, List
 
 try:
     from typing import Literal
 except ImportError:
     from typing_extensions import Literal
 
-
+import base64
+import dataclasses
 import datetime
+import functools
+import threading
+import time
 from abc import ABC, abstractmethod
-from functools import lru_cache
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
 import dateparser
 import requests
 from furl import furl
 
-from .nav import Nav
-from .utils.date import convert_buddhist_to_gregorian, date_range
+from .cache import (
+    MISSING,
+    ONE_DAY,
+    ONE_HOUR,
+    CacheBackend,
+    Revalidator,
+    cached,
+    make_key,
+    new_instance_cache,
+)
+from .keypool import KeyPool
+from .nav import Nav, NavHistory, Snapshot
+from .utils.concurrent import aiter_thread, imap
+from .utils.date import (
+    BANGKOK,
+    PUBLICATION_TIME,
+    business_days_before,
+    convert_buddhist_dates,
+    date_range,
+    next_publication,
+)
+from .utils.decoder import loads
+from .utils.stream import iter_json_array
+
+
+def _pooled_session(pool_maxsize: int = 32) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_maxsize, pool_maxsize=pool_maxsize
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _replace(nav: Nav, **changes) -> Nav:
+    """`dataclasses.replace` keeping `amount`, cached navs stay untouched"""
+    new = dataclasses.replace(nav, **changes)
+    if hasattr(nav, "amount"):
+        new.amount = nav.amount
+    return new
+
+
+def _run_snapshot(fetch, funds: List[str], max_workers: int) -> Snapshot:
+    started = time.perf_counter()
+    snapshot = Snapshot()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, fund): fund for fund in funds}
+        for future in as_completed(futures):
+            fund = futures[future]
+            try:
+                nav = future.result()
+            except Exception as e:
+                snapshot.errors[fund] = repr(e)
+                continue
+            if isinstance(nav, Nav):
+                snapshot.append(nav)
+            elif nav:
+                # multi class fund
+                for n in nav:
+                    snapshot.append(n)
+            else:
+                snapshot.errors[fund] = "no data"
+    snapshot.requested = len(funds)
+    snapshot.elapsed = time.perf_counter() - started
+    return snapshot
+
+
+def parse_class_remark(remark_en: str) -> Dict[str, float]:
+    """Parse NAV of each class from `remark_en` such as `Fund-A= 10.3393/...`"""
+    return {
+        k.strip(): float(v)
+        for x in remark_en.split("/")
+        for k, v in [x.split("=")]
+    }
+
+
+def _parse_datetime(text: str) -> datetime.datetime:
+    # ISO 8601 fast path, dateparser is slow when called for every row
+    try:
+        date = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        date = dateparser.parse(text)
+    return date.replace(tzinfo=None)
+
+
+# days of a Sec history whose request budget is reserved at once
+RESERVE_CHUNK = 250
 
 
 class Source(ABC):
+    def __init__(self, cache: CacheBackend = None):
+        self.cache = cache if cache is not None else new_instance_cache()
+        # validators of reference data such as fund lists, kept apart
+        self.revalidator = Revalidator()
+
+    def clear_cache(self):
+        self.cache.clear()
+
+    def cache_info(self) -> Dict[str, object]:
+        return self.cache.stats()
+
     @abstractmethod
     def get(self, fund: str):
         pass
@@ -27,16 +133,31 @@ class Source(ABC):
     def list(self):
         pass
 
+    def snapshot(self, funds: List[str] = None, max_workers: int = 32):
+        if funds is None:
+            funds = list(self.list())
+        return _run_snapshot(self.get, funds, max_workers)
+
 
 class Finnomena(Source):
     base = furl("https://www.finnomena.com/fn3/api/fund/")
     base_v2 = furl("https://www.finnomena.com/fn3/api/fund/v2/")
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, index=None, cache: CacheBackend = None):
+        super().__init__(cache=cache)
+        self.session = _pooled_session()
+        self.index = index
+
+    def _fund_id(self, fund: str) -> str:
+        if self.index is not None:
+            record = self.index.get(fund)
+            if record is not None and record.get("finnomena_id"):
+                return record["finnomena_id"]
+        return self.list()[fund]["id"]
 
     def _find_earliest(self, navs: List[Nav], date: str):
-        navs.sort(key=lambda x: x.updated, reverse=True)
+        # sorted copy, `navs` is the cached `get_range` list
+        navs = sorted(navs, key=lambda x: x.updated, reverse=True)
 
         date = dateparser.parse(date)
         for nav in navs:
@@ -51,15 +172,16 @@ class Finnomena(Source):
             navs = self.get_range(fund)
             return self._find_earliest(navs, date)
 
-        name2fund = self.list()
+        return self._get_latest(fund, self._fund_id(fund))
 
+    def _get_latest(self, fund: str, fund_id: str):
         url = self.base / "nav" / "latest"
-        url.args["fund"] = name2fund[fund]["id"]
+        url.args["fund"] = fund_id
 
         # convert to str
         url = url.url
 
-        nav = requests.get(url).json()
+        nav = loads(self.session.get(url).content)
         nav = Nav(
             value=float(nav["value"]),
             updated=datetime.datetime.strptime(nav["nav_date"], "%Y-%m-%d"),
@@ -68,20 +190,29 @@ class Finnomena(Source):
         )
         return nav
 
-    # cache here should be sensible since the fund is not regulary update
-    # TODO: change or ttl cache with timeout = [1 hour, 1 day]
-    @lru_cache(maxsize=1024)
-    def get_range_v1(self, fund: str, period="SI"):
+    def snapshot(self, funds: List[str] = None, max_workers: int = 32):
+        # the fund list is resolved once, then only `nav/latest` per fund
         name2fund = self.list()
+        if funds is None:
+            funds = list(name2fund)
+        funds = [fund.lower() for fund in funds]
+
+        def fetch(fund):
+            return self._get_latest(fund, name2fund[fund]["id"])
 
+        return _run_snapshot(fetch, funds, max_workers)
+
+    # cache here should be sensible since the fund is not regulary update
+    @cached(ttl=ONE_HOUR)
+    def get_range_v1(self, fund: str, period="SI"):
         url = self.base / "nav" / "q"
-        url.args["fund"] = name2fund[fund]["id"]
+        url.args["fund"] = self._fund_id(fund)
         url.args["range"] = period
 
         # convert to str
         url = url.url
 
-        navs_response = requests.get(url).json()
+        navs_response = loads(self.session.get(url).content)
 
         navs = []
         for nav_resp in navs_response:
@@ -97,8 +228,7 @@ class Finnomena(Source):
         return navs
 
     # cache here should be sensible since the fund is not regulary update
-    # TODO: change or ttl cache with timeout = [1 hour, 1 day]
-    @lru_cache(maxsize=1024)
+    @cached(ttl=ONE_HOUR)
     def get_range(
         self,
         fund: str,
@@ -106,14 +236,12 @@ class Finnomena(Source):
             "1D", "1W", "1M", "6M", "YTD", "1Y", "3Y", "5Y", "10Y", "MAX"
         ] = "1Y",
     ):
-        name2fund = self.list()
-
         # /fn3/api/fund/v2/ public/funds/F00000IT9T/nav/q
         url = (
             self.base_v2
             / "public"
             / "funds"
-            / name2fund[fund]["id"]
+            / self._fund_id(fund)
             / "nav"
             / "q"
         )
@@ -122,18 +250,11 @@ class Finnomena(Source):
         # convert to str
         url = url.url
 
-        navs_response = requests.get(url).json()
-
-        if not navs_response["status"]:
-            raise Exception(f"response to {url} is invalid")
-
         navs = []
-        for nav_resp in navs_response["data"]["navs"]:
-            date = dateparser.parse(nav_resp["date"])
-            date = date.replace(tzinfo=None)
+        for nav_resp in self._iter_navs(url):
             nav = Nav(
                 value=float(nav_resp["value"]),
-                updated=date,
+                updated=_parse_datetime(nav_resp["date"]),
                 tags={},
                 fund=fund,
             )
@@ -142,14 +263,55 @@ class Finnomena(Source):
 
         return navs
 
+    def _iter_navs(self, url: str):
+        # decode `data.navs` item by item instead of loading the whole body,
+        # a MAX range is many megabytes
+        with self.session.get(url, stream=True) as response:
+            try:
+                yield from iter_json_array(
+                    response.iter_content(chunk_size=64 * 1024), "navs"
+                )
+            except ValueError:
+                raise Exception(f"response to {url} is invalid")
+
+    @cached(ttl=ONE_HOUR)
+    def get_history(
+        self,
+        fund: str,
+        range: Literal[
+            "1D", "1W", "1M", "6M", "YTD", "1Y", "3Y", "5Y", "10Y", "MAX"
+        ] = "1Y",
+    ) -> NavHistory:
+        """Like `get_range` but returns a columnar `NavHistory`"""
+        url = (
+            self.base_v2
+            / "public"
+            / "funds"
+            / self._fund_id(fund)
+            / "nav"
+            / "q"
+        )
+        url.args["range"] = range
+
+        history = NavHistory(fund=fund)
+        for nav_resp in self._iter_navs(url.url):
+            history.append(
+                _parse_datetime(nav_resp["date"]),
+                float(nav_resp["value"]),
+                nav_resp["amount"],
+            )
+        return history
+
     # cache here should be sensible since the fund is not regulary update
-    # TODO: change or ttl cache with timeout = [1 hour, 1 day]
     # TODO: New API exists /fn3/api/fund/public/filter/overview
-    @lru_cache(maxsize=1)
+    @cached(ttl=ONE_DAY)
     def list(self):
         url = self.base / "public" / "list"
         url = url.url
-        funds = requests.get(url).json()
+        _, content = self.revalidator.request(
+            url, lambda headers: self.session.get(url, headers=headers)
+        )
+        funds = loads(content)
         return {fund["short_code"].lower(): fund for fund in funds}
 
     # def _list(self, )
@@ -158,8 +320,14 @@ class Finnomena(Source):
 class Sec(Source):
     base = furl("https://api.sec.or.th/")
 
-    def __init__(self, subscription_key: dict = None):
-        super().__init__()
+    def __init__(
+        self,
+        subscription_key: dict = None,
+        index=None,
+        cache: CacheBackend = None,
+    ):
+        super().__init__(cache=cache)
+        self.index = index
         if subscription_key is None:
             # TODO: Create specific exception for this
             raise ValueError("Missing subscription key")
@@ -173,6 +341,11 @@ class Sec(Source):
                 "subscription_key must contain 'fundfactsheet' and 'funddailyinfo' key"
             )
         self.subscription_key = subscription_key
+        # each product accepts a key, a list of keys or a KeyPool
+        self.key_pools = {
+            product: KeyPool.from_value(subscription_key[product])
+            for product in ["fundfactsheet", "funddailyinfo"]
+        }
         self.headers = {
             "Content-Type": "application/json",
         }
@@ -182,103 +355,290 @@ class Sec(Source):
             ),
             "funddailyinfo": self.base.copy().add(path="FundDailyInfo"),
         }
-        self.session = requests.Session()
+        self.session = _pooled_session()
         self.session.headers.update(self.headers)
 
-    def __get_api_data(
-        self, url, headers=None, subscription_key="fundfactsheet"
+    def _request(
+        self, method: str, url: str, product: str, headers=None, **kargs
     ):
-        if headers is None:
-            headers = self.headers
-        headers.update(
-            {
-                "Ocp-Apim-Subscription-Key": self.subscription_key[
-                    subscription_key
-                ]
-            }
-        )
-        response = self.session.get(url, headers=headers)
+        """Send a request with a key of `product`, rotating over its pool
+
+        A key that is throttled or unauthorized is sidelined by the pool and
+        the request is retried once with each of the other keys.
+        """
+        pool = self.key_pools[product]
+        for attempt in range(len(pool)):
+            key = pool.acquire()
+            # copy so concurrent calls with different keys don't share a dict
+            request_headers = {**self.headers, **(headers or {})}
+            request_headers["Ocp-Apim-Subscription-Key"] = key
+            response = self.session.request(
+                method, url, headers=request_headers, **kargs
+            )
+            retry_after = response.headers.get("Retry-After")
+            pool.release(
+                key,
+                response.status_code,
+                (
+                    float(retry_after)
+                    if retry_after and retry_after.isdigit()
+                    else None
+                ),
+            )
+            if response.status_code not in (401, 403, 429):
+                break
         # check status code
         response.raise_for_status()
-        if response.status_code == 200:
-            if response.headers["content-length"] == "0":
+        return response
+
+    def reserve(self, product: str, calls) -> float:
+        """Check the budget of `product` before a bulk operation
+
+        `calls` are the `(method name, args)` it will make, the ones already
+        cached are not counted. See `KeyPool.reserve`.
+        """
+        needed = sum(
+            1
+            for name, args in calls
+            if self.cache.get(
+                getattr(type(self), name).key(self, *args), MISSING
+            )
+            is MISSING
+        )
+        return self.key_pools[product].reserve(needed) if needed else 0.0
+
+    def usage(self) -> Dict[str, Dict[str, object]]:
+        """Requests made by product, see `KeyPool.usage`"""
+        return {
+            product: pool.usage() for product, pool in self.key_pools.items()
+        }
+
+    def __get_api_data(self, url, subscription_key="fundfactsheet"):
+        # AMC lists and factsheet sections rarely change, revalidate them
+        response, content = self.revalidator.request(
+            url,
+            lambda headers: self._request(
+                "GET", url, subscription_key, headers=headers
+            ),
+        )
+        if response.status_code in (200, 304):
+            if not content:
                 return None
-            return response.json()
+            return loads(content)
         # No content
         elif response.status_code == 204:
             return None
 
     def get(self, fund: str, date: str = None):
-        if date:
-            if isinstance(date, str):
-                query_date = dateparser.parse(date).date()
-            elif isinstance(date, datetime.date):
-                query_date = date
-            elif isinstance(date, datetime.datetime):
-                query_date = date.date()
-        else:
-            # TODO: Upgrade to smarter https://stackoverflow.com/questions/2224742/most-recent-previous-business-day-in-python
-            # PS. should i add pandas as dep? it's so largeee.
-            query_date = last_bus_day = datetime.date.today()
-            wk_day = datetime.date.weekday(last_bus_day)
-            if wk_day > 4:  # if it's Saturday or Sunday
-                last_bus_day = last_bus_day - datetime.timedelta(
-                    days=wk_day - 4
-                )  # then make it Friday
-            query_date = last_bus_day
-
         if not fund:
             raise ValueError("Must specify fund")
 
+        if not date:
+            return self.get_latest(fund)
+        if isinstance(date, str):
+            query_date = dateparser.parse(date).date()
+        elif isinstance(date, datetime.datetime):
+            query_date = date.date()
+        elif isinstance(date, datetime.date):
+            query_date = date
+
         list_fund = self.search(fund)
         if list_fund:
-            fund_info = list_fund.pop(0)
+            fund_info = list_fund[0]
             fund_id = fund_info["proj_id"]
             nav = self.get_nav_from_fund_id(fund_id, query_date)
-
-            if isinstance(nav, Nav):
-                nav.fund = fund_info["proj_abbr_name"]
-                if query_date == datetime.date.today():
-                    nav.tags = {"latest"}
-                return nav
-            else:
-                return nav
+            nav = self._for_fund(fund, fund_info, nav)
+            if isinstance(nav, Nav) and query_date == datetime.date.today():
+                nav = _replace(nav, tags={"latest"})
+            return nav
         else:
             # Fund not found
             # due to query_date is a week day that also a holiday
             return None
 
-    def get_range(self, fund: str, period="SI"):
+    def _for_fund(self, fund: str, fund_info: dict, nav):
+        """Pick the class asked for out of a multi class answer
+
+        Every class of the answer is remembered with `fund_info`, so asking
+        for a sibling class skips the search and hits the cached answer.
+        """
+        if isinstance(nav, Nav):
+            return _replace(nav, fund=fund_info["proj_abbr_name"])
+        if not nav:
+            return nav
+        wanted = None
+        for class_nav in nav:
+            code = class_nav.fund.lower()
+            self.cache.set(
+                make_key(type(self).__name__, "class_fund_info", (code,), {}),
+                fund_info,
+                ttl=ONE_DAY,
+            )
+            if code == fund.lower():
+                wanted = class_nav
+        # the parent fund was asked for, answer every class
+        return wanted or nav
+
+    def get_latest(self, fund: str, probe_days: int = 5):
+        """
+        Latest available NAV of a fund
+
+        The last `probe_days` business days are queried concurrently and the
+        most recent one with data wins, so holidays and calls made before
+        the evening publication still get a value in about one round trip.
+        The answer is cached until the next publication window.
+        """
+        list_fund = self.search(fund)
+        if not list_fund:
+            return None
+        fund_info = list_fund[0]
+        fund_id = fund_info["proj_id"]
+
+        key = make_key(type(self).__name__, "get_latest", (fund_id,), {})
+        nav = self.cache.get(key, MISSING)
+        if nav is MISSING:
+            nav = self._probe_latest(fund_id, probe_days)
+            if nav is None:
+                return None
+            self.cache.set(key, nav, ttl=self._latest_ttl(nav))
+
+        nav = self._for_fund(fund, fund_info, nav)
+        if isinstance(nav, Nav):
+            nav = _replace(nav, tags={"latest"})
+        return nav
+
+    def _probe_latest(self, fund_id: str, probe_days: int):
+        today = datetime.datetime.now(BANGKOK).date()
+
+        def fetch(dd):
+            try:
+                return self.get_nav_from_fund_id(fund_id, dd)
+            except Exception as e:
+                return e
+
+        errors = []
+        for result in imap(
+            fetch,
+            business_days_before(today, probe_days),
+            max_workers=probe_days,
+        ):
+            if isinstance(result, Exception):
+                errors.append(result)
+            elif result:
+                return result
+        # days without data answer None, anything raised is a failure to ask
+        if errors:
+            raise errors[0]
+        return None
+
+    @staticmethod
+    def _latest_ttl(nav) -> float:
+        nav_date = (nav if isinstance(nav, Nav) else nav[0]).updated.date()
+        now = datetime.datetime.now(BANGKOK)
+        ttl = (next_publication(now) - now).total_seconds()
+        if (
+            now.weekday() < 5
+            and now.time() >= PUBLICATION_TIME
+            and nav_date < now.date()
+        ):
+            # today's NAV may still be published this evening
+            ttl = min(ttl, 10 * 60)
+        return ttl
+
+    def get_range(self, fund: str, period="SI", max_workers: int = 8):
         list_fund = self.search(fund)
         if list_fund:
-            fund_info = list_fund.pop(0)
-            today = datetime.date.today()
-            if period == "SI":
-                if fund_info["regis_date"] != "-":
-                    inception_date = dateparser.parse(
-                        fund_info["regis_date"]
-                    ).date()
-                    data_date = date_range(inception_date, today)
-                else:
-                    date_date = [today]
-            else:
-                query_date = dateparser.parse(period).date()
-                data_date = date_range(query_date, today)
-            list_nav = []
-            # Remove weekend
-            data_date = [
-                dd for dd in date_date if dd.isoweekday() not in [6, 7]
-            ]
-            for dd in data_date:
-                nav = self.get_nav_from_fund_id(fund, dd)
-                if nav:
-                    list_nav.append(nav)
-            return list_nav
+            return list(
+                self.iter_range(fund, period=period, max_workers=max_workers)
+            )
         else:
             # Fund not found
             return None
 
-    @lru_cache(maxsize=1024)
+    def _range_dates(self, fund_info: dict, period="SI"):
+        today = datetime.date.today()
+        if period == "SI":
+            if fund_info["regis_date"] != "-":
+                inception_date = dateparser.parse(
+                    fund_info["regis_date"]
+                ).date()
+                data_date = date_range(inception_date, today)
+            else:
+                data_date = [today]
+        else:
+            query_date = dateparser.parse(period).date()
+            data_date = date_range(query_date, today)
+        # Remove weekend
+        return [dd for dd in data_date if dd.isoweekday() not in [6, 7]]
+
+    def iter_range(
+        self,
+        fund: str,
+        period="SI",
+        max_workers: int = 8,
+        ordered: bool = True,
+    ):
+        """
+        Yield `Nav` of each day as soon as it arrives
+
+        Days are fetched `max_workers` at a time and only a small window is
+        held in memory. With `ordered=False` rows come in completion order.
+        """
+        list_fund = self.search(fund)
+        if not list_fund:
+            return
+        fund_info = list_fund[0]
+        fund_id = fund_info["proj_id"]
+        dates = self._range_dates(fund_info, period)
+
+        def fetch(dd):
+            return self.get_nav_from_fund_id(fund_id, dd)
+
+        for nav in imap(
+            fetch,
+            self._reserved_dates(fund_id, dates),
+            max_workers=max_workers,
+            ordered=ordered,
+        ):
+            # only the class asked for out of a multi class answer
+            nav = self._for_fund(fund, fund_info, nav)
+            if isinstance(nav, Nav):
+                yield nav
+            elif nav:
+                # the parent fund was asked for, every class
+                yield from nav
+
+    def _reserved_dates(self, fund_id: str, dates: List[datetime.date]):
+        """Yield `dates`, reserving the budget of each chunk before it
+
+        A chunk whose first and last days are cached is taken as cached, so
+        a long history costs two cache lookups per chunk, not one per day.
+        """
+        key = type(self).get_nav_from_fund_id.key
+        for start in range(0, len(dates), RESERVE_CHUNK):
+            chunk = dates[start : start + RESERVE_CHUNK]
+            if any(
+                self.cache.get(key(self, fund_id, dd), MISSING) is MISSING
+                for dd in {chunk[0], chunk[-1]}
+            ):
+                self.key_pools["funddailyinfo"].reserve(len(chunk))
+            yield from chunk
+
+    def aiter_range(self, fund: str, period="SI", **kargs):
+        """Async iterator version of `iter_range`
+
+        Usage:
+        ```
+        >>> async for nav in source.aiter_range("KT-PRECIOUS"):
+        ...     await db.insert(nav)
+        ```
+        """
+        return aiter_thread(
+            lambda: self.iter_range(fund, period=period, **kargs)
+        )
+
+    # NAV of a past date doesn't change, empty days are not cached
+    @cached()
     def get_nav_from_fund_id(self, fund_id: str, nav_date: datetime.date):
         url = (
             self.base_url["funddailyinfo"]
@@ -286,32 +646,19 @@ class Sec(Source):
             .add(path=[fund_id, "dailynav", nav_date.isoformat()])
             .url
         )
-        headers = self.headers
-        headers.update(
-            {
-                "Ocp-Apim-Subscription-Key": self.subscription_key[
-                    "funddailyinfo"
-                ]
-            }
-        )
-        response = self.session.get(url, headers=headers)
-        # check status code
-        response.raise_for_status()
+        response = self._request("GET", url, "funddailyinfo")
         if response.status_code == 200:
             if response.headers["content-length"] == "0":
-                raise requests.exceptions.ConnectionError("No data received")
-            result = response.json()
+                # no NAV published that day
+                return None
+            result = loads(response.content)
             # Multi class fund
             if (
                 float(result["last_val"]) == 0.0
                 and float(result["previous_val"]) == 0
             ):
                 remark_en = result["amc_info"][0]["remark_en"]
-                multi_class_nav = {
-                    k.strip(): float(v)
-                    for x in remark_en.split("/")
-                    for k, v in [x.split("=")]
-                }
+                multi_class_nav = parse_class_remark(remark_en)
                 list_nav = []
                 for fund_name, nav_val in multi_class_nav.items():
                     n = Nav(
@@ -336,56 +683,89 @@ class Sec(Source):
         elif response.status_code == 204:
             return None
 
-    @lru_cache(maxsize=1024)
+    @cached(ttl=ONE_DAY)
     def list(self):
         return self.search_fund(name="")
 
+    def _published_date(
+        self, fund_ids: List[str], probe_days: int = 5, candidates: int = 3
+    ) -> datetime.date:
+        """Latest date with published NAVs, probed on the first funds"""
+        for fund_id in fund_ids[:candidates]:
+            nav = self._probe_latest(fund_id, probe_days)
+            if nav:
+                return (nav if isinstance(nav, Nav) else nav[0]).updated.date()
+        return business_days_before(datetime.datetime.now(BANGKOK).date(), 1)[0]
+
+    def snapshot(self, funds: List[str] = None, max_workers: int = 32):
+        funds_info = self.list() or []
+        if funds is not None:
+            wanted = {fund.lower() for fund in funds}
+            funds_info = [
+                f for f in funds_info if f["proj_abbr_name"].lower() in wanted
+            ]
+        name2id = {f["proj_abbr_name"]: f["proj_id"] for f in funds_info}
+        # before this evening's publication the latest NAVs are of a
+        # previous business day
+        query_date = self._published_date(list(name2id.values()))
+        self.reserve(
+            "funddailyinfo",
+            [
+                ("get_nav_from_fund_id", (fund_id, query_date))
+                for fund_id in name2id.values()
+            ],
+        )
+
+        def fetch(fund):
+            nav = self.get_nav_from_fund_id(name2id[fund], query_date)
+            if isinstance(nav, Nav):
+                return _replace(nav, fund=fund)
+            return nav
+
+        return _run_snapshot(fetch, list(name2id), max_workers)
+
     def search(self, name: str):
+        if self.index is not None:
+            record = self.index.get(name)
+            if record is not None and record.get("sec"):
+                return [record["sec"]]
+        # share class seen in a multi class answer
+        fund_info = self.cache.get(
+            make_key(
+                type(self).__name__, "class_fund_info", (name.lower(),), {}
+            )
+        )
+        if fund_info is not None:
+            return [fund_info]
         result = self.search_fund(name)
         if result is None:
             result = self.search_class_fund(name)
         return result
 
-    @lru_cache(maxsize=1024)
+    @cached(ttl=ONE_DAY)
     def search_fund(self, name: str):
         url = self.base_url["fundfactsheet"].url
-        headers = self.headers
-        headers.update(
-            {
-                "Ocp-Apim-Subscription-Key": self.subscription_key[
-                    "fundfactsheet"
-                ]
-            }
-        )
-        response = self.session.post(url, headers=headers, json={"name": name})
-        # check status code
-        response.raise_for_status()
+        response = self._request(
+            "POST", url, "fundfactsheet", json={"name": name}
+        )
         if response.status_code == 200:
             if response.headers["content-length"] == "0":
                 raise requests.exceptions.ConnectionError("No data received")
-            return response.json()
+            return loads(response.content)
         # No content
         elif response.status_code == 204:
             return None
 
-    @lru_cache(maxsize=1024)
+    @cached(ttl=ONE_DAY)
     def search_class_fund(self, name: str):
         url = self.base_url["fundfactsheet"].copy().add(path="class_fund").url
-        headers = self.headers
-        headers.update(
-            {
-                "Ocp-Apim-Subscription-Key": self.subscription_key[
-                    "fundfactsheet"
-                ]
-            }
-        )
-        response = self.session.post(url, headers=headers, json={"name": name})
-        # check status code
-        response.raise_for_status()
+        response = self._request(
+            "POST", url, "fundfactsheet", json={"name": name}
+        )
         if response.status_code == 200:
             if response.headers["content-length"] == "0":
                 raise requests.exceptions.ConnectionError("No data received")
-            return response.json()
+            return loads(response.content)
         # No content
         elif response.status_code == 204:
             return None
@@ -653,25 +1033,15 @@ class Sec(Source):
             .url
         )
         result = self.__get_api_data(url)
-        for record in result:
-            if "dividend_details" in record:
-                for dividend_record in record["dividend_details"]:
-                    if dividend_record["book_closing_date"] != "-":
-                        dividend_record["book_closing_date"] = (
-                            convert_buddhist_to_gregorian(
-                                dividend_record["book_closing_date"]
-                            )
-                            .date()
-                            .isoformat()
-                        )
-                    if dividend_record["payment_date"] != "-":
-                        dividend_record["payment_date"] = (
-                            convert_buddhist_to_gregorian(
-                                dividend_record["payment_date"]
-                            )
-                            .date()
-                            .isoformat()
-                        )
+        details = [
+            dividend_record
+            for record in result or []
+            for dividend_record in record.get("dividend_details") or []
+        ]
+        for name in ["book_closing_date", "payment_date"]:
+            dates = convert_buddhist_dates(d[name] for d in details)
+            for dividend_record, date in zip(details, dates):
+                dividend_record[name] = date
         return result
 
     def get_fund_fee(self, fund_id):
@@ -693,13 +1063,10 @@ class Sec(Source):
             .url
         )
         result = self.__get_api_data(url)
-        for record in result:
-            if "effective_date" in record and record["effective_date"] != "-":
-                record["effective_date"] = (
-                    convert_buddhist_to_gregorian(record["effective_date"])
-                    .date()
-                    .isoformat()
-                )
+        records = [r for r in result or [] if "effective_date" in r]
+        dates = convert_buddhist_dates(r["effective_date"] for r in records)
+        for record, date in zip(records, dates):
+            record["effective_date"] = date
         return result
 
     def get_fund_port(self, fund_id, period):
@@ -754,3 +1121,169 @@ class Sec(Source):
         url = self.base_url["funddailyinfo"].copy().add(path=["amc"]).url
         result = self.__get_api_data(url, subscription_key="funddailyinfo")
         return result
+
+
+class Hedged(Source):
+    """Composite source that hedges a request across several sources
+
+    The request goes to the source with the lowest observed latency first.
+    If no valid answer arrives within `hedge_after` seconds, or the source
+    fails, the next source is asked as well and whichever valid `Nav`
+    arrives first is returned.
+
+    **Parameters:**
+
+    * **sources** - sources to hedge across, the order is the preference
+    until latencies are known
+    * **hedge_after** - *(optional)* seconds to wait before hedging
+    * **alpha** - *(optional)* smoothing of the latency moving average
+    """
+
+    def __init__(
+        self,
+        sources: List[Source],
+        hedge_after: float = 0.5,
+        alpha: float = 0.2,
+        cache: CacheBackend = None,
+    ):
+        super().__init__(cache=cache)
+        if not sources:
+            raise ValueError("Must specify at least one source")
+        self.sources = list(sources)
+        self.hedge_after = hedge_after
+        self.alpha = alpha
+        self.stats = [
+            {"latency": None, "requests": 0, "errors": 0, "wins": 0}
+            for _ in self.sources
+        ]
+        self._lock = threading.Lock()
+        # losers keep running after the winner returned, don't block on them
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * len(self.sources),
+            thread_name_prefix="pythainav-hedged",
+        )
+        self.closed = False
+
+    @classmethod
+    def default(cls, subscription_key: dict = None, **kargs):
+        """Finnomena hedged with Sec when a `subscription_key` is given"""
+        sources = [Finnomena()]
+        if subscription_key is not None:
+            sources.append(Sec(subscription_key=subscription_key))
+        return cls(sources, **kargs)
+
+    def ranked(self) -> List[int]:
+        """Indexes of sources, fastest first, unknown latencies keep order"""
+
+        def latency(i):
+            value = self.stats[i]["latency"]
+            return self.hedge_after if value is None else value
+
+        return sorted(range(len(self.sources)), key=latency)
+
+    def _record(self, i: int, elapsed: float, ok: bool):
+        if not ok:
+            # a failure is as bad as a slow answer
+            elapsed = max(elapsed, 2 * self.hedge_after)
+        with self._lock:
+            stats = self.stats[i]
+            stats["requests"] += 1
+            stats["errors"] += 0 if ok else 1
+            if stats["latency"] is None:
+                stats["latency"] = elapsed
+            else:
+                stats["latency"] += self.alpha * (elapsed - stats["latency"])
+
+    def _call(self, i: int, method, *args, **kargs):
+        # a method name, or a function taking the source first
+        source = self.sources[i]
+        if isinstance(method, str):
+            call = getattr(source, method)
+        else:
+            call = functools.partial(method, source)
+        started = time.perf_counter()
+        try:
+            result = call(*args, **kargs)
+        except Exception:
+            self._record(i, time.perf_counter() - started, ok=False)
+            raise
+        self._record(i, time.perf_counter() - started, ok=bool(result))
+        return result
+
+    def _hedge(self, method, *args, **kargs):
+        order = self.ranked()
+        pending = {}
+        error = None
+
+        def submit():
+            i = order.pop(0)
+            pending[
+                self._executor.submit(self._call, i, method, *args, **kargs)
+            ] = i
+
+        submit()
+        while pending:
+            timeout = self.hedge_after if order else None
+            done, _ = wait(
+                pending, timeout=timeout, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if result:
+                    with self._lock:
+                        self.stats[i]["wins"] += 1
+                    return result
+            # timed out or nothing valid yet, hedge to the next source
+            if order:
+                submit()
+        if error is not None:
+            raise error
+        return None
+
+    def get(self, fund: str, date: str = None):
+        return self._hedge("get", fund, date)
+
+    def get_range(self, fund: str, range: str = "MAX"):
+        # Sec takes a `period`, not a `range`, see `api._get_history`
+        from .api import _get_history
+
+        return self._hedge(_get_history, fund, range)
+
+    def list(self) -> List[str]:
+        """Lower case fund codes of the fastest source that answers"""
+        error = None
+        for i in self.ranked():
+            try:
+                funds = self.sources[i].list()
+            except Exception as e:
+                error = e
+                continue
+            if funds:
+                # Finnomena maps codes to funds, Sec lists search records
+                return sorted(
+                    (f if isinstance(f, str) else f["proj_abbr_name"]).lower()
+                    for f in funds
+                )
+        if error is not None:
+            raise error
+        return []
+
+    def latency_stats(self) -> Dict[str, Dict[str, object]]:
+        return {
+            f"{i}:{type(source).__name__}": dict(stats)
+            for i, (source, stats) in enumerate(zip(self.sources, self.stats))
+        }
+
+    def close(self):
+        """Stop the hedging threads and close the sessions of the sources"""
+        self.closed = True
+        self._executor.shutdown(wait=False)
+        for source in self.sources:
+            session = getattr(source, "session", None)
+            if session is not None:
+                session.close()
@@ -0,0 +1,479 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import datetime
+import hashlib
+import json
+import math
+import time
+from itertools import groupby
+
+from .nav import Nav
+from .utils.decoder import loads
+from .utils.sqlite import ThreadLocalConnection
+
+
+def _nav_rows(navs: Iterable[Nav]) -> List[Tuple[str, float, Optional[float]]]:
+    """(date, value, amount) rows sorted by date, as SQLite returns them"""
+    rows = []
+    for nav in navs:
+        amount = getattr(nav, "amount", None)
+        # missing amounts come as None or NaN (`NavHistory`)
+        if amount is not None:
+            amount = float(amount)
+            if math.isnan(amount):
+                amount = None
+        rows.append((_to_date(nav.updated), float(nav.value), amount))
+    return sorted(rows)
+
+
+def _hash_rows(rows: Iterable[Tuple[str, float, Optional[float]]]) -> str:
+    """Hash of (date, value, amount) rows, sorted by date"""
+    digest = hashlib.blake2b(digest_size=8)
+    for date, value, amount in rows:
+        digest.update(f"{date}|{value!r}|{amount!r}\n".encode())
+    return digest.hexdigest()
+
+
+def _row_to_nav(fund: str, row: Tuple[str, float, Optional[float]]) -> Nav:
+    date, value, amount = row
+    nav = Nav(
+        value=value,
+        updated=datetime.datetime.strptime(date, "%Y-%m-%d"),
+        tags=set(),
+        fund=fund,
+    )
+    nav.amount = amount
+    return nav
+
+
+def _to_date(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+class Store:
+    """Local SQLite store of NAV histories and factsheets
+
+    Rows are keyed by (fund, date, source) so writing a history again only
+    replaces the rows it covers. A hash of each fund's rows per month is
+    kept, so writing a refreshed history only touches the months whose
+    content changed and logs restated NAVs (see `changes`). Factsheet
+    sections are kept as JSON keyed
+    by (fund, section, fetched_at). The file can be shared by many processes.
+
+    Usage:
+    ```
+    >>> import pythainav as nav
+    >>> from pythainav.store import Store
+
+    >>> store = Store("pythainav.db")
+    >>> store.write_navs("KT-PRECIOUS", nav.get_all("KT-PRECIOUS"))
+    >>> store.read_navs("KT-PRECIOUS", start="2020-01-01")
+    [Nav(value=..., updated=datetime.datetime(2020, 1, 2, 0, 0), ...), ...]
+    ```
+    """
+
+    def __init__(self, path: str):
+        self._conn = ThreadLocalConnection(path)
+        self.path = self._conn.path
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS nav ("
+                "fund TEXT NOT NULL, date TEXT NOT NULL, value REAL, "
+                "amount REAL, source TEXT NOT NULL DEFAULT '', "
+                "PRIMARY KEY (fund, date, source))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS factsheet ("
+                "fund TEXT NOT NULL, section TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, data TEXT, "
+                "PRIMARY KEY (fund, section, fetched_at))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS nav_hash ("
+                "fund TEXT NOT NULL, source TEXT NOT NULL, "
+                "period TEXT NOT NULL, hash TEXT, rows INTEGER, "
+                "PRIMARY KEY (fund, source, period))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS nav_change ("
+                "fund TEXT NOT NULL, source TEXT NOT NULL, date TEXT NOT NULL, "
+                "old_value REAL, new_value REAL, old_amount REAL, "
+                "new_amount REAL, detected_at REAL)"
+            )
+            # one row per holding, and one per fetched (fund, period) so
+            # periods without holdings are not fetched again
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS holding ("
+                "fund TEXT NOT NULL, period TEXT NOT NULL, "
+                "kind TEXT NOT NULL, seq INTEGER NOT NULL, security TEXT, "
+                "name TEXT, percent_nav REAL, value REAL, data TEXT, "
+                "PRIMARY KEY (fund, period, kind, seq))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS holding_security "
+                "ON holding (security, period)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS holding_period ("
+                "fund TEXT NOT NULL, period TEXT NOT NULL, "
+                "kind TEXT NOT NULL, fetched_at REAL, rows INTEGER, "
+                "PRIMARY KEY (fund, period, kind))"
+            )
+
+    def write_navs(
+        self, fund: str, navs: Iterable[Nav], source: str = ""
+    ) -> int:
+        """Save NAVs, returns how many were given
+
+        See `sync_navs` for what is actually written.
+        """
+        navs = list(navs)
+        self.sync_navs(fund, navs, source=source)
+        return len(navs)
+
+    def sync_navs(
+        self, fund: str, navs: Iterable[Nav], source: str = ""
+    ) -> List[Dict[str, Any]]:
+        """Write only the months of `navs` whose content changed
+
+        Months whose hash matches the stored one are skipped without
+        reading them. Other months are compared row by row with the stored
+        rows, NAVs of dates already stored with another value are logged
+        as restated, and the month is written.
+
+        When `navs` hold several share classes, as Sec histories of multi
+        class funds do, each class is stored under its own `nav.fund`
+        instead of `fund`. Several NAVs of one fund on the same date raise
+        a `ValueError`.
+
+        **Returns:** restated rows as dicts of `fund`, `source`, `date`,
+        `old_value`, `new_value`, `old_amount` and `new_amount`
+        """
+        navs = list(navs)
+        classes = sorted({nav.fund.lower() for nav in navs if nav.fund})
+        if len(classes) > 1:
+            changes = []
+            for code in classes:
+                changes += self._sync_fund(
+                    code,
+                    [nav for nav in navs if (nav.fund or "").lower() == code],
+                    source,
+                )
+            return changes
+        return self._sync_fund(fund, navs, source)
+
+    def _sync_fund(
+        self, fund: str, navs: List[Nav], source: str
+    ) -> List[Dict[str, Any]]:
+        fund = fund.lower()
+        rows = _nav_rows(navs)
+        for (date, *_), (next_date, *_) in zip(rows, rows[1:]):
+            if date == next_date:
+                raise ValueError(f"several NAVs of {fund} on {date}")
+        months = {
+            period: list(month)
+            for period, month in groupby(rows, key=lambda row: row[0][:7])
+        }
+        changes = []
+        with self._conn() as conn:
+            stored = dict(
+                conn.execute(
+                    "SELECT period, hash FROM nav_hash "
+                    "WHERE fund = ? AND source = ?",
+                    (fund, source),
+                )
+            )
+            now = time.time()
+            for period, month in months.items():
+                if stored.get(period) == _hash_rows(month):
+                    continue
+                old = {
+                    date: (value, amount)
+                    for date, value, amount in conn.execute(
+                        "SELECT date, value, amount FROM nav WHERE fund = ? "
+                        "AND source = ? AND date LIKE ?",
+                        (fund, source, f"{period}-%"),
+                    )
+                }
+                for date, value, amount in month:
+                    if date in old and old[date] != (value, amount):
+                        changes.append(
+                            {
+                                "fund": fund,
+                                "source": source,
+                                "date": date,
+                                "old_value": old[date][0],
+                                "new_value": value,
+                                "old_amount": old[date][1],
+                                "new_amount": amount,
+                            }
+                        )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO nav VALUES (?, ?, ?, ?, ?)",
+                    [(fund, *row, source) for row in month],
+                )
+                # the month may hold more rows than were given
+                merged = sorted({**old, **{r[0]: r[1:] for r in month}}.items())
+                conn.execute(
+                    "INSERT OR REPLACE INTO nav_hash VALUES (?, ?, ?, ?, ?)",
+                    (
+                        fund,
+                        source,
+                        period,
+                        _hash_rows((d, *va) for d, va in merged),
+                        len(merged),
+                    ),
+                )
+            conn.executemany(
+                "INSERT INTO nav_change VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*change.values(), now) for change in changes],
+            )
+        return changes
+
+    def changed_periods(
+        self, fund: str, navs: Iterable[Nav], source: str = ""
+    ) -> List[str]:
+        """Months (`YYYY-MM`) of `navs` that differ from the store"""
+        stored = self.hashes(fund, source)
+        rows = _nav_rows(navs)
+        return [
+            period
+            for period, month in groupby(rows, key=lambda row: row[0][:7])
+            if stored.get(period) != _hash_rows(month)
+        ]
+
+    def hashes(self, fund: str, source: str = "") -> Dict[str, str]:
+        """Content hash of each stored month of a fund"""
+        return dict(
+            self._conn().execute(
+                "SELECT period, hash FROM nav_hash WHERE fund = ? "
+                "AND source = ? ORDER BY period",
+                (fund.lower(), source),
+            )
+        )
+
+    def changes(
+        self, fund: str = None, since: float = None
+    ) -> List[Dict[str, Any]]:
+        """Log of restated NAVs, oldest first"""
+        columns = [
+            "fund",
+            "source",
+            "date",
+            "old_value",
+            "new_value",
+            "old_amount",
+            "new_amount",
+            "detected_at",
+        ]
+        query = f"SELECT {', '.join(columns)} FROM nav_change WHERE 1"
+        params = []
+        if fund is not None:
+            query += " AND fund = ?"
+            params.append(fund.lower())
+        if since is not None:
+            query += " AND detected_at >= ?"
+            params.append(since)
+        query += " ORDER BY detected_at, date"
+        return [
+            dict(zip(columns, row))
+            for row in self._conn().execute(query, params)
+        ]
+
+    def read_navs(
+        self,
+        fund: str,
+        source: Optional[str] = None,
+        start=None,
+        end=None,
+    ) -> List[Nav]:
+        query = "SELECT date, value, amount FROM nav WHERE fund = ?"
+        params = [fund.lower()]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(_to_date(start))
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(_to_date(end))
+        query += " ORDER BY date"
+
+        return [
+            _row_to_nav(fund, row)
+            for row in self._conn().execute(query, params)
+        ]
+
+    def asof(
+        self, fund: str, date, source: Optional[str] = None
+    ) -> Optional[Nav]:
+        """Last NAV of a fund on or before `date`, read as a single row"""
+        query = (
+            "SELECT date, value, amount FROM nav WHERE fund = ? AND date <= ?"
+        )
+        params = [fund.lower(), _to_date(date)]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        query += " ORDER BY date DESC LIMIT 1"
+        row = self._conn().execute(query, params).fetchone()
+        return _row_to_nav(fund, row) if row else None
+
+    def latest(self, fund: str, source: Optional[str] = None) -> Optional[Nav]:
+        navs = self.read_navs(
+            fund, source=source, start=self.last_date(fund, source)
+        )
+        return navs[-1] if navs else None
+
+    def last_date(
+        self, fund: str, source: Optional[str] = None
+    ) -> Optional[str]:
+        query = "SELECT MAX(date) FROM nav WHERE fund = ?"
+        params = [fund.lower()]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        return self._conn().execute(query, params).fetchone()[0]
+
+    def funds(self) -> List[str]:
+        return [
+            row[0]
+            for row in self._conn().execute(
+                "SELECT DISTINCT fund FROM nav ORDER BY fund"
+            )
+        ]
+
+    def write_section(
+        self, fund: str, section: str, data: Any, fetched_at: float = None
+    ):
+        """Save a factsheet section, earlier fetches are kept"""
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO factsheet VALUES (?, ?, ?, ?)",
+                (
+                    fund,
+                    section,
+                    time.time() if fetched_at is None else fetched_at,
+                    json.dumps(data, ensure_ascii=False, default=str),
+                ),
+            )
+
+    def read_section(self, fund: str, section: str) -> Any:
+        """Latest fetch of a factsheet section, `None` if never fetched"""
+        row = (
+            self._conn()
+            .execute(
+                "SELECT data FROM factsheet WHERE fund = ? AND section = ? "
+                "ORDER BY fetched_at DESC LIMIT 1",
+                (fund, section),
+            )
+            .fetchone()
+        )
+        return loads(row[0]) if row is not None else None
+
+    def fresh_sections(self, max_age: float) -> Set[Tuple[str, str]]:
+        """(fund, section) fetched less than `max_age` seconds ago"""
+        return set(
+            self._conn().execute(
+                "SELECT fund, section FROM factsheet GROUP BY fund, section "
+                "HAVING MAX(fetched_at) >= ?",
+                (time.time() - max_age,),
+            )
+        )
+
+    def write_holdings(
+        self, fund: str, period: str, kind: str, rows: List[Dict[str, Any]]
+    ) -> int:
+        """Replace the holdings of a fund in a period
+
+        `rows` are normalised holdings with `security`, `name`,
+        `percent_nav`, `value` and the raw record in `data`.
+        """
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM holding WHERE fund = ? AND period = ? "
+                "AND kind = ?",
+                (fund, period, kind),
+            )
+            conn.executemany(
+                "INSERT INTO holding VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        fund,
+                        period,
+                        kind,
+                        seq,
+                        row.get("security"),
+                        row.get("name"),
+                        row.get("percent_nav"),
+                        row.get("value"),
+                        json.dumps(
+                            row.get("data"), ensure_ascii=False, default=str
+                        ),
+                    )
+                    for seq, row in enumerate(rows)
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO holding_period VALUES (?, ?, ?, ?, ?)",
+                (fund, period, kind, time.time(), len(rows)),
+            )
+        return len(rows)
+
+    def holding_periods(self, kind: str) -> Set[Tuple[str, str]]:
+        """(fund, period) whose holdings of `kind` were fetched"""
+        return set(
+            self._conn().execute(
+                "SELECT fund, period FROM holding_period WHERE kind = ?",
+                (kind,),
+            )
+        )
+
+    def read_holdings(
+        self,
+        fund: str = None,
+        period: str = None,
+        kind: str = None,
+        security: str = None,
+    ) -> Dict[str, List[Any]]:
+        """Holdings matching every given filter, column by column
+
+        Filtering on `security` and `period` uses an index, so "which
+        funds hold X in P" is fast over every fund and period.
+
+        **Returns:** dict of `fund`, `period`, `kind`, `security`, `name`,
+        `percent_nav` and `value` lists
+        """
+        columns = [
+            "fund",
+            "period",
+            "kind",
+            "security",
+            "name",
+            "percent_nav",
+            "value",
+        ]
+        filters = {
+            "security": security,
+            "period": period,
+            "fund": fund,
+            "kind": kind,
+        }
+        where = [f"{k} = ?" for k, v in filters.items() if v is not None]
+        query = f"SELECT {', '.join(columns)} FROM holding"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY fund, period, kind, seq"
+        rows = self._conn().execute(
+            query, [v for v in filters.values() if v is not None]
+        )
+        return dict(zip(columns, map(list, zip(*rows)))) or {
+            column: [] for column in columns
+        }
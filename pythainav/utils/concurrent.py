@@ -0,0 +1,91 @@
+from typing import Callable, Iterable, Iterator
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def imap(
+    func: Callable,
+    items: Iterable,
+    max_workers: int = 8,
+    ordered: bool = True,
+) -> Iterator:
+    """
+    Lazy concurrent `map` over a thread pool
+
+    At most `2 * max_workers` items are in flight, so memory stays constant
+    however long `items` is. Results come in input order, or in completion
+    order when `ordered` is False.
+    """
+    items = iter(items)
+    window = 2 * max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def fill():
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    break
+
+        fill()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            result = future.result()
+            fill()
+            yield result
+
+
+async def aiter_thread(factory: Callable[[], Iterator], maxsize: int = 16):
+    """
+    Run a blocking iterator in a thread and yield its items asynchronously
+
+    `factory` is called in the worker thread to create the iterator.
+    """
+    loop = asyncio.get_event_loop()
+    queue = asyncio.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        iterator = factory()
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                put((item, None))
+        except Exception as e:
+            put((end, e))
+        else:
+            put((end, None))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        # unblock the producer if the consumer stopped early
+        stop.set()
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.sleep(0.01)
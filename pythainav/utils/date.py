@@ -1,7 +1,16 @@
+from typing import Iterable, List, Optional
+
 import datetime
+import functools
+import re
 
 import dateparser
 
+# Thailand has no daylight saving time
+BANGKOK = datetime.timezone(datetime.timedelta(hours=7), "Asia/Bangkok")
+# NAVs of a business day are published from this time in the evening
+PUBLICATION_TIME = datetime.time(16, 0)
+
 
 def date_range(start_date, end_date):
     return [
@@ -16,3 +25,51 @@ def convert_buddhist_to_gregorian(input_date):
     year = input_date.year - 543
     input_date = input_date.replace(year=year)
     return input_date
+
+
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+# dates repeat heavily across funds, a few thousand cover a full crawl
+@functools.lru_cache(maxsize=4096)
+def _buddhist_to_iso(text: str) -> str:
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month, day = map(int, match.groups())
+        return datetime.date(year - 543, month, day).isoformat()
+    return convert_buddhist_to_gregorian(text).date().isoformat()
+
+
+def convert_buddhist_dates(values: Iterable[Optional[str]]) -> List[str]:
+    """Convert Buddhist era date strings to ISO Gregorian dates in one pass
+
+    Missing values (`"-"`, empty or `None`) are kept as they are. Each
+    distinct string is parsed once, ISO strings without `dateparser`.
+    """
+    convert = _buddhist_to_iso
+    return [convert(v) if v and v != "-" else v for v in values]
+
+
+def business_days_before(date: datetime.date, count: int):
+    """`count` weekdays up to and including `date`, latest first"""
+    days = []
+    while len(days) < count:
+        if date.isoweekday() not in [6, 7]:
+            days.append(date)
+        date -= datetime.timedelta(days=1)
+    return days
+
+
+def next_publication(
+    now: datetime.datetime = None,
+    at: datetime.time = PUBLICATION_TIME,
+) -> datetime.datetime:
+    """Start of the next publication window after `now`, in Bangkok time"""
+    if now is None:
+        now = datetime.datetime.now(BANGKOK)
+    start = datetime.datetime.combine(now.date(), at, BANGKOK)
+    if now >= start:
+        start += datetime.timedelta(days=1)
+    while start.weekday() > 4:
+        start += datetime.timedelta(days=1)
+    return start
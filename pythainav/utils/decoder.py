@@ -0,0 +1,43 @@
+from typing import Any, Callable, Union
+
+import json
+
+from ._optional import import_optional_dependency
+
+
+def _default_decoder() -> Callable[[Union[bytes, str]], Any]:
+    orjson = import_optional_dependency("orjson", raise_on_missing=False)
+    if orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+_decoder = _default_decoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON response body with the configured decoder"""
+    return _decoder(data)
+
+
+def get_decoder() -> Callable[[Union[bytes, str]], Any]:
+    return _decoder
+
+
+def set_decoder(decoder: Callable[[Union[bytes, str]], Any] = None):
+    """
+    Set the function used to decode every JSON response
+
+    `orjson.loads` is used automatically when orjson is installed, otherwise
+    `json.loads`. Pass `None` to go back to that default.
+
+    Usage:
+    ```
+    >>> import ujson
+    >>> from pythainav.utils.decoder import set_decoder
+
+    >>> set_decoder(ujson.loads)
+    ```
+    """
+    global _decoder
+    _decoder = decoder if decoder is not None else _default_decoder()
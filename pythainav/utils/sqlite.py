@@ -0,0 +1,25 @@
+import os
+import sqlite3
+import threading
+
+
+class ThreadLocalConnection:
+    """SQLite connection per thread and per process
+
+    Connections must not be shared across threads nor cross a fork. WAL mode
+    lets readers of other processes run alongside the single writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,85 @@
+from typing import Iterable, Iterator, Union
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[\s,]*")
+# what may still follow a number decoded at the end of the buffer
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+def iter_json_array(
+    chunks: Iterable[Union[bytes, str]], key: str
+) -> Iterator[object]:
+    """
+    Yield items of the first JSON array stored under `key`, incrementally
+
+    Only the item being decoded and the unread part of the current chunk are
+    held in memory, never the whole body. Keys before the array are skipped
+    without being decoded. Items are decoded by the standard library, whose
+    `raw_decode` can resume mid buffer, so `set_decoder` does not apply here.
+
+    Usage:
+    ```
+    >>> response = session.get(url, stream=True)
+    >>> for nav in iter_json_array(response.iter_content(65536), "navs"):
+    ...     ...
+    ```
+    """
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+
+    def read() -> bool:
+        nonlocal buffer
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = utf8.decode(chunk)
+            if chunk:
+                buffer += chunk
+                return True
+        return False
+
+    # find the opening bracket of the array
+    while True:
+        match = start.search(buffer)
+        if match:
+            buffer = buffer[match.end() :]
+            break
+        # keep a tail in case the key is split across chunks
+        buffer = buffer[-(len(key) + 64) :]
+        if not read():
+            raise ValueError(f"no array under key {key!r} in response")
+
+    pos = 0
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            buffer, pos = "", 0
+            if not read():
+                raise ValueError("unexpected end of JSON array")
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # item is split across chunks, drop what was consumed and read on
+            buffer, pos = buffer[pos:], 0
+            if not read():
+                raise
+            continue
+        if end == len(buffer) or (
+            isinstance(item, (int, float))
+            and not isinstance(item, bool)
+            and _NUMBER_TAIL.fullmatch(buffer, end)
+        ):
+            # a number may continue in the next chunk, e.g. `10.` then `25`
+            buffer, pos = buffer[pos:], 0
+            if read():
+                continue
+        yield item
+        pos = end
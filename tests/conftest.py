@@ -0,0 +1,8 @@
+import pytest
+from pythainav.cache import set_default_cache
+
+
+@pytest.fixture(autouse=True)
+def reset_default_cache():
+    set_default_cache(None)
+    yield
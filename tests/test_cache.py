@@ -0,0 +1,158 @@
+import gc
+import multiprocessing
+import threading
+import time
+import tracemalloc
+import weakref
+
+from pythainav.cache import MemoryCache, SQLiteCache, cached
+from pythainav.nav import Nav
+from pythainav.sources import Source
+
+
+class Counter:
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = 0
+
+    @cached(ttl=60)
+    def double(self, x):
+        self.calls += 1
+        return [x * 2]
+
+
+def test_memory_cache_lru_and_bytes():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache = MemoryCache(max_entries=None, max_bytes=200)
+    for i in range(10):
+        cache.set(str(i), "x" * 50)
+    assert cache.bytes <= 200
+    assert cache.get("9") == "x" * 50
+    assert cache.get("0") is None
+
+
+def test_memory_cache_ttl():
+    cache = MemoryCache()
+    cache.set("a", 1, ttl=-1)
+    assert cache.get("a", "missing") == "missing"
+
+
+def test_cached_method_shares_backend():
+    cache = MemoryCache()
+    first, second = Counter(cache), Counter(cache)
+    assert first.double(2) == [4]
+    assert second.double(2) == [4]
+    assert first.calls + second.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+class Ranges:
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = 0
+
+    @cached(ttl=60)
+    def get_range(self, fund, range="MAX"):
+        self.calls += 1
+        time.sleep(0.05)
+        return [fund, range]
+
+
+def test_cached_keys_bind_arguments():
+    source = Ranges(MemoryCache())
+    assert source.get_range("f") == ["f", "MAX"]
+    assert source.get_range("f", "MAX") == ["f", "MAX"]
+    assert source.get_range("f", range="MAX") == ["f", "MAX"]
+    assert source.get_range(fund="f") == ["f", "MAX"]
+    assert source.calls == 1
+    assert source.get_range("f", "1Y") == ["f", "1Y"]
+    assert source.calls == 2
+
+
+def test_cached_concurrent_misses_call_once():
+    source = Ranges(MemoryCache())
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(source.get_range("f")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [["f", "MAX"]] * 8
+    assert source.calls == 1
+
+
+def _write(path):
+    SQLiteCache(path).set("from-child", {"value": 42})
+
+
+def test_sqlite_cache_shared_across_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path)
+    process = multiprocessing.Process(target=_write, args=(path,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert cache.get("from-child") == {"value": 42}
+    assert cache.stats()["entries"] == 1
+
+    cache.clear()
+    assert cache.get("from-child") is None
+
+
+class History(Source):
+    @cached()
+    def history(self, fund, size):
+        return [
+            Nav(value=float(i), updated=None, tags={}, fund=fund)
+            for i in range(size)
+        ]
+
+    def get(self, fund):
+        return self.history(fund, 1)[0]
+
+    def list(self):
+        return []
+
+
+def test_source_instances_are_not_pinned():
+    def run(n):
+        refs = []
+        for i in range(n):
+            source = History()
+            source.history(f"fund-{i}", 50)
+            refs.append(weakref.ref(source))
+        gc.collect()
+        return refs
+
+    tracemalloc.start()
+    run(200)
+    baseline, _ = tracemalloc.get_traced_memory()
+    refs = run(2000)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert all(ref() is None for ref in refs)
+    # only the weakrefs themselves are left
+    assert current - baseline < 1024 * 1024
+
+
+def test_source_cache_limits_and_clear():
+    source = History(cache=MemoryCache(max_entries=None, max_bytes=50_000))
+    for i in range(50):
+        source.history(f"fund-{i}", 200)
+    info = source.cache_info()
+    assert 0 < info["bytes"] <= 50_000
+    assert info["entries"] < 50
+
+    source.clear_cache()
+    assert source.cache_info()["entries"] == 0
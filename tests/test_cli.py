@@ -0,0 +1,85 @@
+import csv
+import json
+import re
+
+import httpretty
+from pythainav.cli import main
+from pythainav.store import Store
+
+FUNDS = [
+    {"id": "F0001", "short_code": "FUND-A"},
+    {"id": "F0002", "short_code": "FUND-B"},
+]
+
+
+def navs_body(request, uri, response_headers):
+    if "F0002" in uri:
+        return [500, response_headers, "error"]
+    body = {
+        "status": True,
+        "data": {
+            "navs": [
+                {"date": "2020-01-01T00:00:00Z", "value": 10.0, "amount": 1},
+                {"date": "2020-01-02T00:00:00Z", "value": 10.5, "amount": 1},
+            ]
+        },
+    }
+    return [200, response_headers, json.dumps(body)]
+
+
+def register():
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=json.dumps(FUNDS),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://www.finnomena.com/fn3/api/fund/v2/public/.*"),
+        body=navs_body,
+    )
+
+
+@httpretty.activate
+def test_download_resumes(tmp_path):
+    register()
+    output = tmp_path / "navs.csv"
+    state = tmp_path / "state.json"
+    argv = ["download", "-o", str(output), "--state", str(state)]
+
+    assert main(argv) == 1
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [r["fund"] for r in rows] == ["fund-a", "fund-a"]
+    assert json.loads(state.read_text())["done"] == ["fund-a"]
+
+    # second run only retries the failed fund
+    httpretty.reset()
+    register()
+    main(argv)
+    requested = [r.path for r in httpretty.latest_requests()]
+    assert not any("F0001" in path for path in requested)
+
+
+@httpretty.activate
+def test_download_to_store(tmp_path):
+    register()
+    path = str(tmp_path / "navs.db")
+    argv = ["download", "fund-a", "-f", "store", "-o", path, "--state", ""]
+    assert main(argv) == 0
+    assert [n.value for n in Store(path).read_navs("fund-a")] == [10.0, 10.5]
+
+
+@httpretty.activate
+def test_download_state_follows_output(tmp_path):
+    register()
+    first = tmp_path / "first.csv"
+    main(["download", "fund-a", "-o", str(first)])
+    state = tmp_path / "first.csv.state.json"
+    assert json.loads(state.read_text())["done"] == ["fund-a"]
+
+    # another output is not skipped as already done
+    second = tmp_path / "second.csv"
+    assert main(["download", "fund-a", "-o", str(second)]) == 0
+    with open(second) as f:
+        assert len(list(csv.DictReader(f))) == 2
@@ -0,0 +1,72 @@
+import json
+import re
+
+import httpretty
+from pythainav.crawler import FactsheetCrawler
+from pythainav.sources import Sec
+from pythainav.store import Store
+
+BASE = "https://api.sec.or.th/FundFactsheet/fund"
+
+
+def register():
+    httpretty.register_uri(
+        httpretty.GET,
+        f"{BASE}/amc",
+        body=json.dumps([{"unique_id": "C01"}, {"unique_id": "C02"}]),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(rf"{BASE}/amc/C0\d"),
+        body=lambda request, uri, headers: [
+            200,
+            headers,
+            json.dumps([{"proj_id": f"M{uri[-1]}"}]),
+        ],
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(rf"{BASE}/M\d/fee"),
+        body=json.dumps([{"fee_type_desc": "management fee"}]),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(rf"{BASE}/M\d/risk"),
+        body=lambda request, uri, headers: [500, headers, "error"],
+    )
+
+
+def section_requests():
+    return [
+        r.path
+        for r in httpretty.latest_requests()
+        if r.path.endswith(("/fee", "/risk"))
+    ]
+
+
+@httpretty.activate
+def test_crawl_skips_fresh_sections(tmp_path):
+    register()
+    store = Store(str(tmp_path / "store.db"))
+    source = Sec(
+        subscription_key={"fundfactsheet": "key", "funddailyinfo": "key"}
+    )
+    crawler = FactsheetCrawler(source, store, sections=["fee", "risk"])
+
+    report = crawler.run()
+    assert (report.funds, report.fetched, report.skipped) == (2, 2, 0)
+    assert sorted(report.errors) == ["M1/risk", "M2/risk"]
+    assert store.read_section("M1", "fee") == [
+        {"fee_type_desc": "management fee"}
+    ]
+    assert store.read_section("M1", "risk") is None
+
+    # only the failed sections are fetched again
+    httpretty.reset()
+    register()
+    report = crawler.run()
+    assert (report.fetched, report.skipped) == (0, 2)
+    assert sorted(section_requests()) == [
+        "/FundFactsheet/fund/M1/risk",
+        "/FundFactsheet/fund/M2/risk",
+    ]
@@ -0,0 +1,17 @@
+from pythainav.utils.date import (
+    convert_buddhist_dates,
+    convert_buddhist_to_gregorian,
+)
+
+
+def test_convert_buddhist_dates():
+    assert convert_buddhist_dates(
+        ["2561-12-14", "-", None, "2563-02-29", "2561-12-14"]
+    ) == ["2018-12-14", "-", None, "2020-02-29", "2018-12-14"]
+
+
+def test_convert_buddhist_dates_fallback():
+    expected = convert_buddhist_to_gregorian("14 December 2561")
+    assert convert_buddhist_dates(["14 December 2561"]) == [
+        expected.date().isoformat()
+    ]
@@ -0,0 +1,59 @@
+import json
+import re
+
+import httpretty
+import pytest
+from pythainav.fund import Fund
+from pythainav.sources import Sec
+
+
+@pytest.fixture
+def source():
+    return Sec(
+        subscription_key={
+            "fundfactsheet": "fact_key",
+            "funddailyinfo": "daily_key",
+        }
+    )
+
+
+def section_body(request, uri, response_headers):
+    section = uri.rsplit("/", 1)[-1]
+    return [200, response_headers, json.dumps({"section": section})]
+
+
+@httpretty.activate
+def test_fund_sections_are_lazy_and_cached(source):
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundFactsheet/fund/M0001_2553/.*"),
+        body=section_body,
+    )
+    fund = Fund("M0001_2553", source=source)
+    assert len(httpretty.latest_requests()) == 0
+
+    assert fund.fee == {"section": "fee"}
+    assert fund.fee == {"section": "fee"}
+    assert len(httpretty.latest_requests()) == 1
+
+    with pytest.raises(AttributeError):
+        fund.not_a_section
+
+
+@httpretty.activate
+def test_fund_prefetch(source):
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundFactsheet/fund/M0001_2553/.*"),
+        body=section_body,
+    )
+    fund = Fund("M0001_2553", source=source)
+    sections = fund.prefetch(["risk", "asset", "turnover_ratio"])
+
+    assert sections["asset"] == {"section": "asset"}
+    assert len(httpretty.latest_requests()) == 3
+    assert fund.risk == {"section": "risk"}
+    assert len(httpretty.latest_requests()) == 3
+
+    with pytest.raises(ValueError):
+        fund.prefetch(["not_a_section"])
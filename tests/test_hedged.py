@@ -0,0 +1,120 @@
+import datetime
+import time
+
+import pytest
+import pythainav as nav
+from pythainav.api import _create_source, _sec_period
+from pythainav.nav import Nav
+from pythainav.sources import Hedged, Sec, Source
+
+
+class FakeSource(Source):
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+
+    def get(self, fund, date=None):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.name)
+        return Nav(
+            value=1.0,
+            updated=datetime.datetime(2020, 1, 1),
+            tags={self.name},
+            fund=fund,
+        )
+
+    def list(self):
+        return {}
+
+
+def test_hedge_to_faster_source():
+    source = Hedged(
+        [FakeSource("slow", delay=0.5), FakeSource("fast")], hedge_after=0.05
+    )
+    started = time.perf_counter()
+    nav = source.get("FUND")
+    assert nav.tags == {"fast"}
+    assert time.perf_counter() - started < 0.4
+
+    # the slow one finishes later and the fast one becomes primary
+    time.sleep(0.6)
+    assert source.ranked() == [1, 0]
+    assert source.get("FUND").tags == {"fast"}
+
+
+def test_fallback_on_error():
+    source = Hedged(
+        [FakeSource("down", fail=True), FakeSource("up", delay=0.01)],
+        hedge_after=1,
+    )
+    started = time.perf_counter()
+    assert source.get("FUND").tags == {"up"}
+    # hedged right away instead of waiting for `hedge_after`
+    assert time.perf_counter() - started < 0.5
+    assert source.stats[0]["errors"] == 1
+
+
+def test_all_sources_fail():
+    source = Hedged([FakeSource("a", fail=True), FakeSource("b", fail=True)])
+    with pytest.raises(ConnectionError):
+        source.get("FUND")
+
+
+class FakeSec(Sec):
+    def __init__(self):
+        Source.__init__(self)
+        self.periods = []
+
+    def get_range(self, fund, period="SI"):
+        self.periods.append(period)
+        return [Nav(value=1.0, updated=None, tags={}, fund=fund)]
+
+
+def test_get_range_asks_sec_for_a_period():
+    sec = FakeSec()
+    source = Hedged([sec])
+    assert source.get_range("FUND", "MAX")[0].fund == "FUND"
+    assert source.get_range("FUND", range="1Y")
+    assert sec.periods == ["SI", _sec_period("1Y")]
+    assert source.stats[0]["errors"] == 0
+
+
+def test_hedged_source_is_shared():
+    source = _create_source("hedged")
+    assert _create_source("hedged") is source
+    source.close()
+    assert _create_source("hedged") is not source
+
+
+def test_sec_period_of_ranges():
+    today = datetime.date(2020, 3, 31)
+    assert _sec_period("MAX", today) == "SI"
+    assert _sec_period("YTD", today) == "2020-01-01"
+    assert _sec_period("1W", today) == "2020-03-24"
+    assert _sec_period("1M", today) == "2020-02-29"
+    assert _sec_period("1Y", today) == "2019-03-31"
+
+
+def test_get_all_from_sec():
+    sec = FakeSec()
+    navs = nav.get_all("KT-PRECIOUS", source=sec, range="MAX")
+    assert navs[0].fund == "KT-PRECIOUS"
+    assert sec.periods == ["SI"]
+
+
+class ListingSec(FakeSec):
+    def list(self):
+        return [{"proj_abbr_name": "FUND-B"}, {"proj_abbr_name": "FUND-A"}]
+
+
+class ListingFinnomena(FakeSource):
+    def list(self):
+        return {"fund-a": {"id": "F0001"}, "fund-c": {"id": "F0003"}}
+
+
+def test_list_is_fund_codes_whatever_the_source():
+    assert Hedged([ListingSec()]).list() == ["fund-a", "fund-b"]
+    assert Hedged([ListingFinnomena("f")]).list() == ["fund-a", "fund-c"]
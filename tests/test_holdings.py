@@ -0,0 +1,57 @@
+import datetime
+import json
+import re
+
+import httpretty
+from pythainav.holdings import holdings_frame, ingest_holdings, month_periods
+from pythainav.sources import Sec
+from pythainav.store import Store
+
+TOP5 = {
+    "M1": [
+        {"asset_name": "PTT", "asset_ratio": "12.5"},
+        {"asset_name": "AOT", "asset_ratio": "8.1"},
+    ],
+    "M2": [{"asset_name": "ptt ", "asset_ratio": "20"}],
+}
+
+
+def top5(request, uri, headers):
+    fund, period = uri.split("/")[-3], uri.split("/")[-1]
+    if period == "202002":
+        return [204, headers, ""]
+    return [200, headers, json.dumps(TOP5[fund])]
+
+
+def test_month_periods():
+    assert month_periods(
+        datetime.date(2019, 11, 5), datetime.date(2020, 2, 1)
+    ) == ["201911", "201912", "202001", "202002"]
+
+
+@httpretty.activate
+def test_ingest_and_query_by_security(tmp_path):
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundFactsheet/fund/.*/FundTop5/.*"),
+        body=top5,
+    )
+    store = Store(str(tmp_path / "store.db"))
+    source = Sec(
+        subscription_key={"fundfactsheet": "key", "funddailyinfo": "key"}
+    )
+
+    report = ingest_holdings(source, store, ["M1", "M2"], ["202001", "202002"])
+    assert (report.fetched, report.skipped, report.errors) == (4, 0, {})
+
+    ptt = store.read_holdings(security="PTT", period="202001")
+    assert ptt["fund"] == ["M1", "M2"]
+    assert ptt["percent_nav"] == [12.5, 20.0]
+    assert store.read_holdings(period="202002")["fund"] == []
+
+    # nothing is fetched again, empty periods included
+    report = ingest_holdings(source, store, ["M1", "M2"], ["202001", "202002"])
+    assert (report.fetched, report.skipped) == (0, 4)
+
+    frame = holdings_frame(store, fund="M1")
+    assert list(frame.security) == ["PTT", "AOT"]
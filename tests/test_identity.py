@@ -0,0 +1,46 @@
+from pythainav.identity import IdentityMap
+
+
+class FakeFinnomena:
+    def list(self):
+        return {"fund": {"id": "F0001", "short_code": "FUND"}}
+
+
+class FakeSec:
+    def list(self):
+        return [
+            {
+                "proj_id": "M0001_2553",
+                "proj_abbr_name": "FUND",
+                "proj_name_en": "Fund",
+                "regis_date": "-",
+            }
+        ]
+
+    def search_class_fund(self, name):
+        return None
+
+
+def test_refresh_links_sources(tmp_path):
+    path = str(tmp_path / "identity.db")
+    ids = IdentityMap(path)
+    assert ids.refresh(finnomena=FakeFinnomena(), sec=FakeSec()) == 1
+    assert ids.resolve("FUND", source="finnomena") == "F0001"
+    assert ids.resolve("fund", source="sec") == "M0001_2553"
+
+    # nothing changed, nothing written
+    assert ids.refresh(finnomena=FakeFinnomena(), sec=FakeSec()) == 0
+    ids.close()
+
+    reopened = IdentityMap(path)
+    assert reopened.get("FUND")["sec"]["proj_id"] == "M0001_2553"
+
+
+def test_add_classes():
+    ids = IdentityMap()
+    ids.refresh(sec=FakeSec())
+    ids.add_classes("M0001_2553", "Fund-A= 10.3393/Fund-D= 10.3516")
+
+    assert ids.classes("FUND") == ["fund-a", "fund-d"]
+    assert ids.resolve("FUND-D", source="sec") == "M0001_2553"
+    assert ids.get("FUND-A")["sec"]["proj_abbr_name"] == "FUND"
@@ -0,0 +1,102 @@
+import json
+import re
+import time
+
+import httpretty
+import pytest
+from pythainav.keypool import BudgetExceeded, KeyPool, NoAvailableKey
+from pythainav.sources import Sec
+
+
+def test_rotation_and_rate_limit():
+    pool = KeyPool(["a", "b"], rate=20)
+    started = time.monotonic()
+    keys = [pool.acquire() for _ in range(6)]
+    elapsed = time.monotonic() - started
+
+    assert sorted(keys) == ["a", "a", "a", "b", "b", "b"]
+    # 3 requests per key at 20/s need 2 intervals of 50ms
+    assert 0.09 < elapsed < 0.5
+
+
+def test_sideline_and_quota():
+    pool = KeyPool(["a", "b"], quota=2, cooldown=0.05)
+    pool.release(pool.acquire(), 429)
+    throttled = [k for k, s in pool.stats().items() if s["throttled"]][0]
+    other = "b" if throttled == "a" else "a"
+
+    assert pool.acquire() == other
+    assert pool.acquire() == other
+    # other is out of quota, wait for the throttled key to come back
+    assert pool.acquire() == throttled
+    with pytest.raises(NoAvailableKey):
+        pool.acquire()
+
+
+def test_unauthorized_keys():
+    pool = KeyPool(["a"])
+    pool.release(pool.acquire(), 401)
+    with pytest.raises(NoAvailableKey):
+        pool.acquire()
+
+
+@httpretty.activate
+def test_sec_retries_with_next_key():
+    def search(request, uri, response_headers):
+        if request.headers["Ocp-Apim-Subscription-Key"] == "revoked":
+            return [401, response_headers, "{}"]
+        return [200, response_headers, json.dumps([{"proj_id": "M0001"}])]
+
+    httpretty.register_uri(
+        httpretty.POST,
+        re.compile(r"https://api.sec.or.th/FundFactsheet/fund"),
+        body=search,
+    )
+    source = Sec(
+        subscription_key={
+            "fundfactsheet": ["revoked", "valid"],
+            "funddailyinfo": "daily_key",
+        }
+    )
+
+    assert source.search_fund("FUND-A") == [{"proj_id": "M0001"}]
+    assert source.search_fund("FUND-B") == [{"proj_id": "M0001"}]
+    stats = source.key_pools["fundfactsheet"].stats()
+    assert stats["revoked"]["unauthorized"] <= 1
+    assert stats["valid"]["requests"] == 2
+
+
+def test_budget_fails_fast_with_estimate():
+    pool = KeyPool(["a", "b"], budget=3, budget_period=60, pace=False)
+    assert pool.reserve(3) == 0
+    for _ in range(2):
+        pool.acquire()
+
+    with pytest.raises(BudgetExceeded) as e:
+        pool.reserve(5)
+    assert e.value.remaining == 1
+    assert 59 < e.value.eta <= 120
+
+    pool.acquire()
+    with pytest.raises(BudgetExceeded):
+        pool.acquire()
+
+    usage = pool.usage()
+    assert usage["minute"] == usage["day"] == 3
+    assert usage["budget_left"] == 0
+    assert usage["keys"]["a"]["hour"] + usage["keys"]["b"]["hour"] == 3
+
+
+def test_budget_paces_requests():
+    pool = KeyPool(["a"], budget=2, budget_period=0.1)
+    started = time.monotonic()
+    for _ in range(4):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.1
+
+
+def test_reserve_over_quota():
+    pool = KeyPool(["a", "b"], quota=2)
+    with pytest.raises(BudgetExceeded) as e:
+        pool.reserve(5)
+    assert e.value.remaining == 4
@@ -0,0 +1,61 @@
+import datetime
+import statistics
+
+import pytest
+from pythainav.metrics import (
+    Drawdown,
+    RollingMetrics,
+    RollingReturn,
+    RollingVolatility,
+)
+from pythainav.nav import Nav
+
+VALUES = [10.0, 10.5, 10.2, 9.8, 10.9, 11.3, 10.1, 10.4, 10.8, 11.0]
+
+
+def make_navs(values):
+    start = datetime.datetime(2020, 1, 1)
+    return [
+        Nav(
+            value=v,
+            updated=start + datetime.timedelta(days=i),
+            tags={},
+            fund="FUND",
+        )
+        for i, v in enumerate(values)
+    ]
+
+
+def test_rolling_return():
+    acc = RollingReturn(3).seed(VALUES)
+    assert acc.value == pytest.approx(VALUES[-1] / VALUES[-4] - 1)
+
+    assert RollingReturn(30).seed(VALUES).value is None
+
+
+def test_rolling_volatility_matches_full_recompute():
+    window = 4
+    acc = RollingVolatility(window)
+    returns = [b / a - 1 for a, b in zip(VALUES, VALUES[1:])]
+    for i, value in enumerate(VALUES):
+        acc.update(value)
+        if i >= window:
+            expected = statistics.stdev(returns[i - window : i])
+            assert acc.value == pytest.approx(expected)
+
+
+def test_drawdown():
+    acc = Drawdown().seed(VALUES)
+    assert acc.value == pytest.approx(11.0 / 11.3 - 1)
+    assert acc.max_drawdown == pytest.approx(10.1 / 11.3 - 1)
+
+    windowed = Drawdown(window=3).seed(VALUES)
+    assert windowed.value == pytest.approx(0.0)
+
+
+def test_duplicate_navs_are_ignored():
+    navs = make_navs(VALUES)
+    metrics = RollingMetrics(windows=[3]).seed(navs)
+    before = metrics.values()
+    metrics.update(navs[-1])
+    assert metrics.values() == before
@@ -0,0 +1,131 @@
+import datetime
+import json
+import re
+
+import httpretty
+import pytest
+from pythainav.nav import Nav
+from pythainav.portfolio import fetch_histories, valuate, valuate_total
+from pythainav.sources import Finnomena, Sec, Source
+
+pd = pytest.importorskip("pandas")
+
+
+@pytest.fixture
+def prices():
+    return pd.DataFrame(
+        {
+            "fund": ["a", "b", "a", "b", "a"],
+            "date": pd.to_datetime(
+                [
+                    "2020-01-01",
+                    "2020-01-01",
+                    "2020-01-02",
+                    "2020-01-03",
+                    "2020-01-04",
+                ]
+            ),
+            "nav": [1.0, 2.0, 1.5, 2.5, 3.0],
+        }
+    )
+
+
+def test_valuate_transactions(prices):
+    holdings = [
+        {"fund": "A", "units": 10, "date": "2020-01-02"},
+        {"fund": "B", "units": 5, "date": "2020-01-01"},
+        {"fund": "A", "units": -5, "date": "2020-01-04"},
+    ]
+    total = valuate_total(holdings, prices=prices)
+    assert total.tolist() == [10.0, 25.0, 27.5, 27.5]
+
+
+def test_valuate_asof_dates(prices):
+    holdings = [{"portfolio": "p1", "fund": "a", "units": 2}]
+    values = valuate(holdings, ["2020-01-03"], prices=prices)
+    assert values["nav"].tolist() == [1.5]
+    assert values["value"].tolist() == [3.0]
+
+
+class FakeSec(Sec):
+    def __init__(self):
+        Source.__init__(self)
+        self.listed = 0
+
+    def list(self):
+        self.listed += 1
+        return []
+
+    def get_range(self, fund, period="SI"):
+        return [Nav(1.0, datetime.datetime(2020, 1, 1), {period}, fund)]
+
+
+def test_fetch_histories_from_sec():
+    source = FakeSec()
+    prices = fetch_histories(["A", "b", "a"], source=source)
+    assert prices["fund"].tolist() == ["a", "b"]
+    # Sec looks funds up by name, its whole universe is not listed
+    assert source.listed == 0
+
+
+class MultiClassSec(Sec):
+    def __init__(self):
+        Source.__init__(self)
+
+    def search(self, name):
+        return [
+            {"proj_id": "M0001", "proj_abbr_name": "FUND", "regis_date": "-"}
+        ]
+
+    def _range_dates(self, fund_info, period="SI"):
+        return [datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)]
+
+    def _reserved_dates(self, fund_id, dates):
+        return dates
+
+    def list(self):
+        return []
+
+    def get_nav_from_fund_id(self, fund_id, nav_date):
+        updated = datetime.datetime.combine(nav_date, datetime.time())
+        return [
+            Nav(10.0, updated, {}, "FUND-A"),
+            Nav(20.0, updated, {}, "FUND-D"),
+        ]
+
+
+def test_valuate_multi_class_fund():
+    source = MultiClassSec()
+    assert {nav.fund for nav in source.get_range("FUND-A")} == {"FUND-A"}
+
+    values = valuate([{"fund": "FUND-A", "units": 2}], source=source)
+    assert values["fund"].unique().tolist() == ["fund-a"]
+    assert values["nav"].tolist() == [10.0, 10.0]
+    assert values["value"].tolist() == [20.0, 20.0]
+
+
+@httpretty.activate
+def test_fetch_histories_lists_finnomena_once():
+    funds = [{"id": f"F{i}", "short_code": f"FUND-{i}"} for i in range(8)]
+    navs = {
+        "navs": [{"date": "2020-01-01T00:00:00Z", "value": 1.0, "amount": 1}]
+    }
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=json.dumps(funds),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://www.finnomena.com/fn3/api/fund/v2/public/.*"),
+        body=json.dumps({"status": True, "data": navs}),
+    )
+
+    prices = fetch_histories(
+        [f["short_code"] for f in funds], source=Finnomena()
+    )
+    assert len(prices) == 8
+    listed = [
+        r for r in httpretty.latest_requests() if r.path.endswith("/list")
+    ]
+    assert len(listed) == 1
@@ -0,0 +1,74 @@
+import json
+
+import httpretty
+from pythainav.cache import recache
+from pythainav.sources import Finnomena, Sec
+
+FUNDS = json.dumps([{"id": "F0001", "short_code": "FUND-A"}] * 50)
+
+
+def conditional(body, etag):
+    def respond(request, uri, headers):
+        headers["ETag"] = etag
+        if request.headers.get("If-None-Match") == etag:
+            return [304, headers, ""]
+        return [200, headers, body]
+
+    return respond
+
+
+@httpretty.activate
+def test_finnomena_list_revalidated():
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=conditional(FUNDS, '"v1"'),
+    )
+    source = Finnomena()
+
+    first = source.list()
+    assert recache(source, "list") == first
+    assert httpretty.last_request().headers["If-None-Match"] == '"v1"'
+    assert source.revalidator.stats() == {
+        "requests": 2,
+        "not_modified": 1,
+        "bytes_saved": len(FUNDS),
+    }
+
+
+@httpretty.activate
+def test_sec_factsheet_revalidated():
+    amcs = json.dumps([{"unique_id": "C01"}])
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://api.sec.or.th/FundFactsheet/fund/amc",
+        body=conditional(amcs, '"amc"'),
+    )
+    source = Sec(
+        subscription_key={"fundfactsheet": "key", "funddailyinfo": "key"}
+    )
+
+    assert source.list_amc() == source.list_amc() == [{"unique_id": "C01"}]
+    assert source.revalidator.bytes_saved == len(amcs)
+
+
+@httpretty.activate
+def test_evicted_body_is_asked_again():
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=conditional(FUNDS, '"v1"'),
+    )
+    source = Finnomena()
+    first = source.list()
+
+    # validators were read, then the body was evicted before the 304
+    source.revalidator.cache.clear()
+    source.revalidator.headers = lambda url: {"If-None-Match": '"v1"'}
+    assert recache(source, "list") == first
+    assert "If-None-Match" not in httpretty.last_request().headers
+
+
+def test_bodies_are_kept_apart_from_results():
+    source = Finnomena()
+    assert source.revalidator.cache is not source.cache
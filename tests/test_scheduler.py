@@ -0,0 +1,94 @@
+import datetime
+
+from pythainav.nav import Nav
+from pythainav.scheduler import BANGKOK, RefreshScheduler
+from pythainav.sources import Sec, Source
+from pythainav.store import Store
+
+
+class FakeSource(Source):
+    def __init__(self):
+        super().__init__()
+        self.date = datetime.datetime(2020, 1, 2)
+
+    def get(self, fund, date=None):
+        return Nav(value=10.0, updated=self.date, tags=set(), fund=fund)
+
+    def list(self):
+        return ["fund-a", "fund-b"]
+
+
+def test_run_once_only_reports_changes(tmp_path):
+    source = FakeSource()
+    store = Store(str(tmp_path / "navs.db"))
+    scheduler = RefreshScheduler(source, store=store)
+
+    assert len(scheduler.run_once()) == 2
+    assert scheduler.run_once() == []
+    assert store.funds() == ["fund-a", "fund-b"]
+
+    source.date = datetime.datetime(2020, 1, 3)
+    changed = scheduler.run_once()
+    assert len(changed) == 2
+    assert scheduler.last_refresh["fund-a"]["nav_date"] == source.date
+
+
+class FakeSec(Sec):
+    def __init__(self):
+        Source.__init__(self)
+        self.periods = []
+
+    def get(self, fund, date=None):
+        return Nav(
+            value=10.0,
+            updated=datetime.datetime(2020, 1, 2),
+            tags=set(),
+            fund=fund,
+        )
+
+    def list(self):
+        return [{"proj_abbr_name": "FUND-A"}]
+
+    def snapshot(self, funds=None, max_workers=32):
+        return Source.snapshot(self, ["fund-a"], max_workers)
+
+    def get_range(self, fund, period="SI"):
+        self.periods.append(period)
+        return []
+
+
+def test_run_once_refreshes_sec_histories(tmp_path):
+    source = FakeSec()
+    store = Store(str(tmp_path / "navs.db"))
+    scheduler = RefreshScheduler(
+        source, store=store, source_name="sec", ranges=["MAX"]
+    )
+
+    assert len(scheduler.run_once()) == 1
+    assert source.periods == ["SI"]
+    assert len(store.read_navs("fund-a", source="sec")) == 1
+    assert store.read_navs("fund-a", source="") == []
+
+
+def test_backoff_inside_window():
+    scheduler = RefreshScheduler(
+        FakeSource(), min_interval=10, max_interval=35, backoff=2
+    )
+    # a Thursday evening
+    now = datetime.datetime(2020, 1, 2, 18, 0, tzinfo=BANGKOK)
+    scheduler._now = lambda: now
+
+    assert scheduler.next_delay(changed=False) == 20
+    assert scheduler.next_delay(changed=False) == 35
+    assert scheduler.next_delay(changed=True) == 10
+
+
+def test_sleep_until_next_window():
+    scheduler = RefreshScheduler(FakeSource())
+    # Friday night, next window is Monday 16:00
+    now = datetime.datetime(2020, 1, 3, 23, 45, tzinfo=BANGKOK)
+    scheduler._now = lambda: now
+    delay = scheduler.next_delay(changed=False)
+    assert now + datetime.timedelta(seconds=delay) == datetime.datetime(
+        2020, 1, 6, 16, 0, tzinfo=BANGKOK
+    )
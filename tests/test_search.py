@@ -0,0 +1,98 @@
+import threading
+
+from pythainav.search import FundIndex
+
+RECORDS = [
+    {
+        "code": "kt-precious",
+        "finnomena_id": "F0001",
+        "proj_id": "M0001_2553",
+        "name_th": "กองทุนเปิดเคแทม โกลด์",
+        "name_en": "KTAM Gold Fund",
+    },
+    {"code": "kt-pif", "proj_id": "M0002_2553", "name_en": "KTAM Property"},
+    {"code": "tistech-a", "proj_id": "M0003_2553", "parent": "tistech"},
+]
+
+
+def test_exact_and_prefix():
+    index = FundIndex(RECORDS)
+    assert index.get("KT-PRECIOUS")["proj_id"] == "M0001_2553"
+    assert "TISTECH-A" in index
+    assert index.get("kt") is None
+    assert [r["code"] for r in index.prefix("KT-")] == ["kt-pif", "kt-precious"]
+
+
+def test_fuzzy_name():
+    index = FundIndex(RECORDS)
+    result = index.fuzzy("ktam gold")
+    assert result[0]["code"] == "kt-precious"
+
+
+def test_refresh_when_stale():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return RECORDS
+
+    index = FundIndex(loader=loader, refresh_interval=0)
+    assert index.get("kt-pif") is not None
+    assert len(calls) == 1
+
+    index.refresh_interval = 60
+    index.get("kt-pif")
+    assert len(calls) == 1
+
+
+def test_first_lookup_loads_with_default_interval():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return RECORDS
+
+    index = FundIndex(loader=loader)
+    assert index.stale
+    assert index.get("kt-pif")["proj_id"] == "M0002_2553"
+    assert index.get("kt-precious") is not None
+    assert len(calls) == 1
+
+
+def test_stale_index_refreshes_once_in_background():
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return RECORDS[:1]
+
+    index = FundIndex(RECORDS, loader=loader, refresh_interval=60)
+    index.built_at = 0
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(index.get("kt-pif")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # lookups answered from the old records without waiting for the reload
+    assert all(r["proj_id"] == "M0002_2553" for r in results)
+
+    release.set()
+    index._refresher.join()
+    assert len(calls) == 1
+    assert index.get("kt-pif") is None
+    assert len(calls) == 1
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "funds.json"
+    FundIndex(RECORDS).save(path)
+    index = FundIndex.load(path)
+    assert len(index) == 3
+    assert index.get("kt-precious")["name_th"] == RECORDS[0]["name_th"]
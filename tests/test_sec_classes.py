@@ -0,0 +1,63 @@
+import datetime
+import json
+import re
+
+import httpretty
+from pythainav.nav import Nav
+from pythainav.sources import Sec
+
+SEARCH = [
+    {
+        "proj_id": "M0002_2560",
+        "proj_abbr_name": "FUND",
+        "regis_date": "-",
+    }
+]
+
+
+def dailynav(request, uri, response_headers):
+    body = {
+        "nav_date": uri.rsplit("/", 1)[-1],
+        "last_val": 0,
+        "previous_val": 0,
+        "net_asset": 1000,
+        "amc_info": [{"remark_en": "FUND-A= 10.5/FUND-D= 11.25"}],
+    }
+    return [200, response_headers, json.dumps(body)]
+
+
+@httpretty.activate
+def test_sibling_class_served_from_one_answer():
+    httpretty.register_uri(
+        httpretty.POST,
+        "https://api.sec.or.th/FundFactsheet/fund",
+        body=json.dumps(SEARCH),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundDailyInfo/.*/dailynav/.*"),
+        body=dailynav,
+    )
+    source = Sec(
+        subscription_key={
+            "fundfactsheet": "fact_key",
+            "funddailyinfo": "daily_key",
+        }
+    )
+    date = datetime.date(2020, 1, 2)
+
+    nav = source.get("FUND-A", date=date)
+    assert isinstance(nav, Nav)
+    assert (nav.fund, nav.value) == ("FUND-A", 10.5)
+    requests = len(httpretty.latest_requests())
+
+    nav = source.get("fund-d", date=date)
+    assert (nav.fund, nav.value) == ("FUND-D", 11.25)
+    # no search and no daily NAV request for the sibling class
+    assert len(httpretty.latest_requests()) == requests
+
+    # the parent fund gets every class
+    assert [n.fund for n in source.get("FUND", date=date)] == [
+        "FUND-A",
+        "FUND-D",
+    ]
@@ -0,0 +1,108 @@
+import datetime
+import json
+import re
+
+import httpretty
+import pytest
+import requests
+from pythainav.sources import Sec
+from pythainav.utils.date import BANGKOK, business_days_before, next_publication
+
+SEARCH = [
+    {
+        "proj_id": "M0001_2553",
+        "proj_abbr_name": "FUND",
+        "regis_date": "-",
+    }
+]
+
+TODAY = datetime.datetime.now(BANGKOK).date()
+# the last two business days are not published yet
+PUBLISHED = business_days_before(TODAY, 3)[-1]
+
+
+def dailynav(request, uri, response_headers):
+    nav_date = uri.rsplit("/", 1)[-1]
+    if nav_date > PUBLISHED.isoformat():
+        return [204, response_headers, ""]
+    body = {
+        "nav_date": nav_date,
+        "last_val": 10.0,
+        "previous_val": 9.9,
+        "net_asset": 1000,
+        "amc_info": [],
+    }
+    return [200, response_headers, json.dumps(body)]
+
+
+@pytest.fixture
+def source():
+    httpretty.reset()
+    httpretty.enable()
+    httpretty.register_uri(
+        httpretty.POST,
+        "https://api.sec.or.th/FundFactsheet/fund",
+        body=json.dumps(SEARCH),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundDailyInfo/.*/dailynav/.*"),
+        body=dailynav,
+    )
+    yield Sec(
+        subscription_key={
+            "fundfactsheet": "fact_key",
+            "funddailyinfo": "daily_key",
+        }
+    )
+    httpretty.disable()
+
+
+def dailynav_requests():
+    return [r for r in httpretty.latest_requests() if "dailynav" in r.path]
+
+
+def test_get_latest_available(source):
+    nav = source.get("FUND")
+
+    assert nav.updated.date() == PUBLISHED
+    assert nav.fund == "FUND"
+    assert nav.tags == {"latest"}
+    assert len(dailynav_requests()) == 5
+
+    # cached until the next publication window
+    assert source.get("FUND") == nav
+    assert len(dailynav_requests()) == 5
+
+    # the tag is set on a copy, not on the cached NAV of that day
+    assert source.get("FUND", date=PUBLISHED).tags == {}
+
+
+def test_get_latest_raises_when_unreachable(source, monkeypatch):
+    def unreachable(fund_id, nav_date):
+        raise requests.exceptions.ConnectionError("Name or service not known")
+
+    monkeypatch.setattr(source, "get_nav_from_fund_id", unreachable)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        source.get("FUND")
+
+
+def test_snapshot_of_published_date(source):
+    snap = source.snapshot()
+
+    assert snap.fund == ["FUND"]
+    assert [nav.updated.date() for nav in snap.navs()] == [PUBLISHED]
+    # the cached daily answer keeps its own fund
+    nav = source.get_nav_from_fund_id("M0001_2553", PUBLISHED)
+    assert nav.fund == "M0001_2553"
+
+
+def test_next_publication():
+    friday_night = datetime.datetime(2020, 1, 3, 20, 0, tzinfo=BANGKOK)
+    assert next_publication(friday_night) == datetime.datetime(
+        2020, 1, 6, 16, 0, tzinfo=BANGKOK
+    )
+    monday_noon = datetime.datetime(2020, 1, 6, 12, 0, tzinfo=BANGKOK)
+    assert next_publication(monday_noon) == datetime.datetime(
+        2020, 1, 6, 16, 0, tzinfo=BANGKOK
+    )
@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+import json
+import re
+
+import httpretty
+import pytest
+from pythainav.sources import Sec
+
+SEARCH = [
+    {
+        "proj_id": "M0001_2553",
+        "proj_abbr_name": "FUND",
+        "regis_date": "-",
+    }
+]
+
+
+def dailynav(request, uri, response_headers):
+    nav_date = uri.rsplit("/", 1)[-1]
+    body = {
+        "nav_date": nav_date,
+        "last_val": 10.0,
+        "previous_val": 9.9,
+        "net_asset": 1000,
+        "amc_info": [],
+    }
+    return [200, response_headers, json.dumps(body)]
+
+
+@pytest.fixture
+def source():
+    httpretty.reset()
+    httpretty.enable()
+    httpretty.register_uri(
+        httpretty.POST,
+        "https://api.sec.or.th/FundFactsheet/fund",
+        body=json.dumps(SEARCH),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://api.sec.or.th/FundDailyInfo/.*/dailynav/.*"),
+        body=dailynav,
+    )
+    yield Sec(
+        subscription_key={
+            "fundfactsheet": "fact_key",
+            "funddailyinfo": "daily_key",
+        }
+    )
+    httpretty.disable()
+
+
+def business_days(days):
+    today = datetime.date.today()
+    dates = [today - datetime.timedelta(days=x) for x in range(days, -1, -1)]
+    return [d for d in dates if d.isoweekday() not in [6, 7]]
+
+
+def test_iter_range_in_order(source):
+    start = datetime.date.today() - datetime.timedelta(days=10)
+    navs = list(source.iter_range("FUND", period=start.isoformat()))
+
+    assert [n.updated.date() for n in navs] == business_days(10)
+    assert {n.fund for n in navs} == {"FUND"}
+    assert source.get_range("FUND", period=start.isoformat()) == navs
+
+
+def test_aiter_range(source):
+    start = datetime.date.today() - datetime.timedelta(days=10)
+
+    async def collect():
+        return [
+            nav
+            async for nav in source.aiter_range(
+                "FUND", period=start.isoformat(), ordered=False
+            )
+        ]
+
+    navs = asyncio.run(collect())
+    assert sorted(n.updated.date() for n in navs) == business_days(10)
+
+
+def test_cached_range_probes_the_cache_per_chunk(source):
+    start = datetime.date.today() - datetime.timedelta(days=30)
+    navs = source.get_range("FUND", period=start.isoformat())
+    misses = source.cache.stats()["misses"]
+
+    # every day is cached now, nothing reserved nor probed day by day
+    source.key_pools["funddailyinfo"].reserve = None
+    assert source.get_range("FUND", period=start.isoformat()) == navs
+    assert source.cache.stats()["misses"] - misses < len(navs)
+
+
+def test_range_over_budget(source):
+    from pythainav.keypool import BudgetExceeded, KeyPool
+
+    start = datetime.date.today() - datetime.timedelta(days=30)
+    source.key_pools["funddailyinfo"] = KeyPool(["a"], budget=5, pace=False)
+    with pytest.raises(BudgetExceeded):
+        source.get_range("FUND", period=start.isoformat())
+    assert source.usage()["funddailyinfo"]["day"] == 0
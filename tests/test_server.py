@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+
+from pythainav.nav import Nav
+from pythainav.server import NavService
+from pythainav.sources import Sec, Source
+from pythainav.store import Store
+
+
+class SlowSource(Source):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, fund, date=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return Nav(
+            value=10.5,
+            updated=datetime.datetime(2020, 1, 3),
+            tags=set(),
+            fund=fund,
+        )
+
+    def get_range(self, fund, range="1Y"):
+        return [
+            Nav(
+                value=10.0 + i,
+                updated=datetime.datetime(2020, 1, 1 + i),
+                tags=set(),
+                fund=fund,
+            )
+            for i in [0, 1, 2]
+        ]
+
+    def list(self):
+        return ["fund-a"]
+
+
+async def request(port, method, target, body=b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: x\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def test_endpoints_and_coalescing():
+    source = SlowSource()
+    service = NavService(source)
+
+    async def main():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            results = await asyncio.gather(
+                *(request(port, "GET", "/latest?fund=FUND-A") for _ in range(5))
+            )
+            assert {status for status, _ in results} == {200}
+            assert results[0][1]["value"] == 10.5
+
+            status, history = await request(
+                port, "GET", "/history?fund=FUND-A&range=1M"
+            )
+            assert [n["updated"] for n in history] == [
+                "2020-01-01",
+                "2020-01-02",
+                "2020-01-03",
+            ]
+
+            status, nav = await request(
+                port, "GET", "/asof?fund=FUND-A&date=2020-01-02"
+            )
+            assert (status, nav["value"]) == (200, 11.0)
+
+            batch = json.dumps(
+                [
+                    {"op": "latest", "fund": "FUND-B"},
+                    {"op": "asof", "fund": "FUND-A", "date": "2019-01-01"},
+                    {"op": "nope", "fund": "FUND-A"},
+                ]
+            ).encode()
+            status, answers = await request(port, "POST", "/batch", batch)
+            assert answers[0]["result"]["fund"] == "FUND-B"
+            assert answers[1] == {"result": None}
+            assert "unknown op" in answers[2]["error"]
+
+            assert (await request(port, "GET", "/latest"))[0] == 400
+            return (await request(port, "GET", "/metrics"))[1]
+
+    metrics = asyncio.run(main())
+    service.close()
+
+    # five identical concurrent queries, one call
+    assert source.calls == 2
+    assert metrics["coalesced"] == 4
+    assert metrics["endpoints"]["latest"]["requests"] == 6
+    assert metrics["endpoints"]["latest"]["errors"] == 1
+
+
+class NewestFirst(SlowSource):
+    def __init__(self):
+        super().__init__()
+        self.history = super().get_range("FUND-A")[::-1]
+
+    def get_range(self, fund, range="1Y"):
+        return self.history
+
+
+def test_asof_from_history_keeps_it_untouched():
+    source = NewestFirst()
+    service = NavService(source)
+    assert service.asof("FUND-A", "2020-01-02").value == 11.0
+    assert service.asof("FUND-A", "2019-12-31") is None
+    assert [n.value for n in source.history] == [12.0, 11.0, 10.0]
+    service.close()
+
+
+class DailySec(Sec):
+    def __init__(self):
+        Source.__init__(self)
+        self.dates = []
+
+    def get(self, fund, date=None):
+        self.dates.append(date)
+        if date.isoweekday() > 5:
+            return None
+        return Nav(
+            1.0, datetime.datetime.combine(date, datetime.time()), {}, fund
+        )
+
+
+def test_asof_sec_weekend_and_store(tmp_path):
+    source = DailySec()
+    service = NavService(source)
+    # Sunday, answered by Friday's NAV
+    nav = service.asof("FUND", "2020-01-05")
+    assert nav.updated == datetime.datetime(2020, 1, 3)
+    assert len(source.dates) == 1
+
+    store = Store(str(tmp_path / "store.db"))
+    store.write_navs(
+        "FUND", [Nav(2.0, datetime.datetime(2020, 1, 2), {}, "FUND")]
+    )
+    service = NavService(source, store=store)
+    assert service.asof("FUND", "2020-01-05").value == 2.0
+    assert len(source.dates) == 1
+    service.close()
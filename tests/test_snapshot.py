@@ -0,0 +1,43 @@
+import json
+import re
+
+import httpretty
+import pythainav as nav
+from pythainav.nav import Snapshot
+
+FUNDS = [
+    {"id": "F0001", "short_code": "FUND-A"},
+    {"id": "F0002", "short_code": "FUND-B"},
+    {"id": "F0003", "short_code": "FUND-C"},
+]
+
+
+def latest_nav(request, uri, response_headers):
+    fund_id = request.querystring["fund"][0]
+    if fund_id == "F0003":
+        return [500, response_headers, "error"]
+    body = {"value": "10.5", "nav_date": "2020-01-02"}
+    return [200, response_headers, json.dumps(body)]
+
+
+@httpretty.activate
+def test_snapshot_finnomena():
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=json.dumps(FUNDS),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://www.finnomena.com/fn3/api/fund/nav/latest.*"),
+        body=latest_nav,
+    )
+
+    snap = nav.snapshot(max_workers=4)
+
+    assert isinstance(snap, Snapshot)
+    assert sorted(snap.fund) == ["fund-a", "fund-b"]
+    assert snap.value == [10.5, 10.5]
+    assert list(snap.errors) == ["fund-c"]
+    assert snap.requested == 3
+    assert snap.elapsed > 0
@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+from pythainav.nav import Nav
+from pythainav.store import Store
+
+
+def navs(values, start=datetime.datetime(2020, 1, 30)):
+    result = []
+    for i, value in enumerate(values):
+        nav = Nav(
+            value=value,
+            updated=start + datetime.timedelta(days=i),
+            tags=set(),
+            fund="FUND",
+        )
+        nav.amount = 100
+        result.append(nav)
+    return result
+
+
+def test_sync_logs_restated_navs(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    assert store.sync_navs("FUND", navs([10.0, 10.1, 10.2, 10.3])) == []
+    assert list(store.hashes("FUND")) == ["2020-01", "2020-02"]
+
+    # unchanged history, nothing to do
+    assert store.changed_periods("FUND", navs([10.0, 10.1, 10.2, 10.3])) == []
+    assert store.sync_navs("FUND", navs([10.0, 10.1, 10.2, 10.3])) == []
+
+    # 2020-02-01 restated
+    restated = navs([10.0, 10.1, 10.25, 10.3])
+    assert store.changed_periods("FUND", restated) == ["2020-02"]
+    changes = store.sync_navs("FUND", restated)
+    assert [(c["date"], c["old_value"], c["new_value"]) for c in changes] == [
+        ("2020-02-01", 10.2, 10.25)
+    ]
+    assert [c["date"] for c in store.changes("fund")] == ["2020-02-01"]
+    assert [n.value for n in store.read_navs("FUND")] == [
+        10.0,
+        10.1,
+        10.25,
+        10.3,
+    ]
+
+
+def test_partial_month_keeps_hash_of_whole_month(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.write_navs("FUND", navs([10.0, 10.1]))
+    store.write_navs("FUND", navs([10.2], start=datetime.datetime(2020, 1, 1)))
+    assert (
+        store.changed_periods(
+            "FUND",
+            navs([10.2], start=datetime.datetime(2020, 1, 1))
+            + navs([10.0, 10.1]),
+        )
+        == []
+    )
+    assert store.changes() == []
+
+
+def test_sync_multi_class_navs(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    history = navs([10.0, 10.1])
+    for nav in navs([20.0, 20.1]):
+        nav.fund = "FUND-A"
+        history.append(nav)
+
+    assert store.sync_navs("FUND", history) == []
+    assert store.sync_navs("FUND", history) == []
+    assert store.changes() == []
+    assert [n.value for n in store.read_navs("fund-a")] == [20.0, 20.1]
+    assert [n.value for n in store.read_navs("fund")] == [10.0, 10.1]
+
+    with pytest.raises(ValueError):
+        store.sync_navs("FUND", navs([10.0]) + navs([10.5]))
+
+
+def test_latest_of_a_source(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.write_navs("FUND", navs([10.0, 10.1]), source="sec")
+    store.write_navs("FUND", navs([10.0, 10.1, 10.2]), source="finnomena")
+
+    assert store.latest("FUND", source="sec").value == 10.1
+    assert store.latest("FUND").value == 10.2
+    assert store.last_date("FUND", source="sec") == "2020-01-31"
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from pythainav.utils.stream import iter_json_array
+
+DOC = {
+    "status": True,
+    "data": {
+        "meta": {"navs": "not this one"},
+        "navs": [
+            {"date": f"2020-01-{i:02}T00:00:00Z", "value": i * 1.5, "amount": 1}
+            for i in range(1, 20)
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 100000])
+def test_iter_json_array_chunked(size):
+    body = json.dumps(DOC).encode()
+    chunks = (body[i : i + size] for i in range(0, len(body), size))
+    assert list(iter_json_array(chunks, "navs")) == DOC["data"]["navs"]
+
+
+def test_iter_json_array_split_number_and_utf8():
+    body = '{"navs": [12, "ทองคำ"]}'.encode()
+    chunks = [body[:11], body[11:17], body[17:]]
+    assert list(iter_json_array(chunks, "navs")) == [12, "ทองคำ"]
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        [b'{"navs":[10.', b"25, 2]}"],
+        [b'{"navs":[1e', b"3, 2]}"],
+        [b'{"navs":[1.5E-', b"2, -", b"3]}"],
+    ],
+)
+def test_iter_json_array_number_split_after_dot_or_exponent(chunks):
+    expected = json.loads(b"".join(chunks))["navs"]
+    assert list(iter_json_array(chunks, "navs")) == expected
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"status": false}'], "navs"))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"navs": [1, 2'], "navs"))
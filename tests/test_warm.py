@@ -0,0 +1,91 @@
+import json
+import re
+
+import httpretty
+import pytest
+import pythainav as nav
+from pythainav.cache import MemoryCache, set_default_cache
+from pythainav.sources import Finnomena
+
+FUNDS = [
+    {"id": "F0001", "short_code": "FUND-A"},
+    {"id": "F0002", "short_code": "FUND-B"},
+]
+
+
+def navs_body(request, uri, response_headers):
+    if "F0002" in uri:
+        return [500, response_headers, "error"]
+    body = {
+        "status": True,
+        "data": {
+            "navs": [
+                {"date": "2020-01-01T00:00:00Z", "value": 10.0, "amount": 1},
+                {"date": "2020-01-02T00:00:00Z", "value": 10.5, "amount": 1},
+            ]
+        },
+    }
+    return [200, response_headers, json.dumps(body)]
+
+
+def register():
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://www.finnomena.com/fn3/api/fund/public/list",
+        body=json.dumps(FUNDS),
+    )
+    httpretty.register_uri(
+        httpretty.GET,
+        re.compile(r"https://www.finnomena.com/fn3/api/fund/v2/public/.*"),
+        body=navs_body,
+    )
+
+
+@httpretty.activate
+def test_warm_source_cache():
+    register()
+    source = Finnomena()
+
+    report = nav.warm(
+        ["FUND-A", "FUND-B"], ranges=["1Y", "MAX"], sources=[source]
+    )
+
+    assert report.loaded == [
+        "finnomena:FUND-A:1Y",
+        "finnomena:FUND-A:MAX",
+        "finnomena:list",
+    ]
+    assert sorted(report.errors) == [
+        "finnomena:FUND-B:1Y",
+        "finnomena:FUND-B:MAX",
+    ]
+    assert not report.ready
+    assert report.entries == 3
+    assert report.bytes > 0
+    assert report.elapsed > 0
+
+    # served from the warm cache
+    requests = len(httpretty.latest_requests())
+    assert len(nav.get_all("FUND-A", source=source)) == 2
+    assert len(httpretty.latest_requests()) == requests
+
+
+@httpretty.activate
+def test_warm_default_cache():
+    register()
+    cache = MemoryCache()
+    set_default_cache(cache)
+
+    try:
+        report = nav.warm(["FUND-A"])
+    finally:
+        set_default_cache(None)
+
+    assert report.ready
+    assert report.sources[0].cache is cache
+    assert report.bytes == cache.stats()["bytes"]
+
+
+def test_warm_by_name_needs_default_cache():
+    with pytest.raises(ValueError):
+        nav.warm(["FUND-A"], sources=["finnomena"])